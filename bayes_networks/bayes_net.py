@@ -6,11 +6,16 @@ This module defines the BayesNet class for representing a Bayesian network.
 Classes:
 - BayesNet: Represents a Bayesian network. Each network is a directed acyclic graph where nodes represent 
   random variables and edges represent conditional dependencies between the variables.
+- CompiledBayesNet: A frozen BayesNet with integer variable ids, parent/child id arrays and a
+  cached topological order, for inference code that needs constant-time lookups.
 
 The BayesNet class has methods for: 
 - adding nodes to the network
+- building the network from flat structure and CPT arrays
 - retrieving a node for a given variable  
 - retrieving the domain of a variable
+- pruning the network to the part relevant to a query
+- compiling the network into a CompiledBayesNet
 - representing the network as a string.
 
 University: University of Peloponnese, Department of Informatics and Telecommunications
@@ -22,7 +27,8 @@ Authors:
 - Giannopoulos Ioannis
 
 """
-from typing import List, Optional, Union
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple, Union
+import numpy as np
 from bayes_networks.bayes_node import BayesNode
 
 class BayesNet:
@@ -32,6 +38,8 @@ class BayesNet:
         """Nodes must be ordered with parents before children."""
         self.nodes: List[BayesNode] = []
         self.variables: List[str] = []
+        self.nodes_by_variable: Dict[str, BayesNode] = {}
+        self._pruned: Dict[Tuple[FrozenSet[str], FrozenSet[str]], 'CompiledBayesNet'] = {}
         node_specs = node_specs or []
         for node_spec in node_specs:
             self.add(node_spec)
@@ -40,25 +48,188 @@ class BayesNet:
         """Add a node to the net. Its parents must already be in the
         net, and its variable must not."""
         node = BayesNode(*node_spec)
-        assert node.variable not in self.variables
-        assert all((parent in self.variables) for parent in node.parents)
+        assert node.variable not in self.nodes_by_variable
+        assert all((parent in self.nodes_by_variable) for parent in node.parents)
         self.nodes.append(node)
         self.variables.append(node.variable)
+        self.nodes_by_variable[node.variable] = node
         for parent in node.parents:
-            self.variable_node(parent).children.append(node)
+            self.nodes_by_variable[parent].children.append(node)
+        self._pruned.clear()
+
+    @classmethod
+    def from_arrays(cls, variables: List[str], parent_offsets: np.ndarray, parent_ids: np.ndarray,
+                    cpts: np.ndarray) -> 'BayesNet':
+        """Build a net from its structure and CPTs as flat arrays, as stored
+        by net_io. Node i is variables[i], its parents are the variables
+        parent_ids[parent_offsets[i]:parent_offsets[i + 1]] (ids smaller than
+        i, in CPT order), and its CPT is the next 2**len(parents) entries of
+        cpts. The arrays are checked all at once and each node's CPT is a
+        view of cpts, so no table is copied or checked node by node."""
+        parent_offsets = np.asarray(parent_offsets, dtype=np.int64)
+        parent_ids = np.asarray(parent_ids, dtype=np.intp)
+        cpts = np.asarray(cpts, dtype=float)
+        n = len(variables)
+        assert len(parent_offsets) == n + 1 and parent_offsets[0] == 0 and parent_offsets[-1] == len(parent_ids)
+        n_parents = np.diff(parent_offsets)
+        assert (n_parents >= 0).all()
+        owner = np.repeat(np.arange(n), n_parents)
+        assert ((0 <= parent_ids) & (parent_ids < owner)).all(), "parents must come before children"
+        cpt_offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.left_shift(1, n_parents), out=cpt_offsets[1:])
+        assert len(cpts) == cpt_offsets[-1], "cpts must hold 2**len(parents) entries per node"
+        assert ((0 <= cpts) & (cpts <= 1)).all()
+        assert len(set(variables)) == n, "variables must be distinct"
+
+        net = cls()
+        net.variables = list(variables)
+        bounds = parent_offsets.tolist()
+        cpt_bounds = cpt_offsets.tolist()
+        ids = parent_ids.tolist()
+        ptrue = cpts.tolist()
+        nodes = net.nodes
+        for i, var in enumerate(net.variables):
+            own = ids[bounds[i]:bounds[i + 1]]
+            start, stop = cpt_bounds[i], cpt_bounds[i + 1]
+            node = BayesNode.from_table(var, [net.variables[j] for j in own], cpts[start:stop], ptrue[start:stop])
+            nodes.append(node)
+            for j in own:
+                nodes[j].children.append(node)
+        net.nodes_by_variable = dict(zip(net.variables, net.nodes))
+        return net
 
     def variable_node(self, var: str) -> BayesNode:
         """Return the node for the variable named var.
         >>> burglary.variable_node('Burglary').variable
         'Burglary'"""
-        for n in self.nodes:
-            if n.variable == var:
-                return n
-        raise Exception("No such variable: {}".format(var))
+        try:
+            return self.nodes_by_variable[var]
+        except KeyError:
+            raise Exception("No such variable: {}".format(var))
 
     def variable_values(self, var: str) -> List[bool]:
         """Return the domain of var."""
         return [True, False]
 
+    def ancestors(self, variables: Iterable[str]) -> Set[str]:
+        """Return variables together with all their ancestors."""
+        result: Set[str] = set()
+        stack = list(variables)
+        while stack:
+            var = stack.pop()
+            if var not in result:
+                result.add(var)
+                stack.extend(self.variable_node(var).parents)
+        return result
+
+    def prune(self, X: Union[str, Iterable[str]], e: Iterable[str]) -> 'CompiledBayesNet':
+        """Return the smallest sub-network that gives the same posterior
+        P(X | e) as this one. X is a query variable or several of them, and
+        e the evidence (a dict, or just the names of the observed variables).
+
+        Barren nodes (those that are not ancestors of X or e) are dropped
+        first. Then the moral graph of what remains is searched from X without
+        passing through evidence; nodes not reached are d-separated from X by e
+        and their CPTs only scale P(e), so they are dropped too. An observed
+        node whose CPT was dropped but which is still a parent of a kept node
+        becomes a root with prior 0.5: its value is fixed by the evidence, so
+        the prior cancels in every posterior (but P(e) itself is not preserved).
+
+        The result is cached per (query variables, evidence variables), so
+        repeated queries with the same shape pay for pruning only once."""
+        query = frozenset([X] if isinstance(X, str) else X)
+        observed = frozenset(e)
+        key = (query, observed)
+        if key not in self._pruned:
+            self._pruned[key] = self._prune(query, observed).compile()
+        return self._pruned[key]
+
+    def _prune(self, query: FrozenSet[str], observed: FrozenSet[str]) -> 'BayesNet':
+        assert not query & observed, "Query variables must be distinct from evidence"
+        ancestral = self.ancestors(query | observed)
+        moral: Dict[str, Set[str]] = {var: set() for var in ancestral}
+        for var in ancestral:
+            family = [var] + self.variable_node(var).parents
+            for a in family:
+                moral[a].update(family)
+        relevant: Set[str] = set()
+        stack = list(query)
+        while stack:
+            var = stack.pop()
+            if var not in relevant:
+                relevant.add(var)
+                stack.extend(n for n in moral[var] if n not in observed)
+        keep_cpt = {var for var in ancestral
+                    if var in relevant or (var in observed and relevant & set(self.variable_node(var).parents))}
+        keep = set(keep_cpt)
+        for var in keep_cpt:
+            keep.update(self.variable_node(var).parents)
+        pruned = BayesNet()
+        for node in self.nodes:
+            if node.variable in keep_cpt:
+                pruned.add((node.variable, node.parents, node.cpt))
+            elif node.variable in keep:
+                pruned.add((node.variable, [], 0.5))
+        return pruned
+
+    def compile(self) -> 'CompiledBayesNet':
+        """Return a frozen copy of the net with integer ids and cached
+        structure for fast inference."""
+        return CompiledBayesNet(self)
+
+    def __repr__(self) -> str:
+        return 'BayesNet({0!r})'.format(self.nodes)
+
+
+class CompiledBayesNet(BayesNet):
+    """A frozen BayesNet. Variable i is self.variables[i], its node is
+    self.nodes[i], and ids maps each variable name back to i. Parent and
+    child ids and the topological order are computed once, so inference
+    code can work on integer arrays instead of names. Nodes (and their
+    CPT arrays) are shared with the net it was compiled from."""
+
+    def __init__(self, bn: BayesNet):
+        self.nodes: List[BayesNode] = list(bn.nodes)
+        self.variables: List[str] = list(bn.variables)
+        self.nodes_by_variable: Dict[str, BayesNode] = dict(bn.nodes_by_variable)
+        self._pruned: Dict[Tuple[FrozenSet[str], FrozenSet[str]], CompiledBayesNet] = {}
+        self.ids: Dict[str, int] = {var: i for i, var in enumerate(self.variables)}
+        self.parent_ids: List[np.ndarray] = [np.array([self.ids[p] for p in node.parents], dtype=np.intp)
+                                             for node in self.nodes]
+        self.child_ids: List[np.ndarray] = [np.array([self.ids[c.variable] for c in node.children], dtype=np.intp)
+                                            for node in self.nodes]
+        self.topological_order: np.ndarray = self._topological_order()
+
+    def _topological_order(self) -> np.ndarray:
+        """Kahn's algorithm over the parent/child id arrays."""
+        in_degree = [len(parents) for parents in self.parent_ids]
+        order = [i for i, d in enumerate(in_degree) if d == 0]
+        for i in order:
+            for c in self.child_ids[i]:
+                in_degree[c] -= 1
+                if in_degree[c] == 0:
+                    order.append(int(c))
+        assert len(order) == len(self.nodes), "BayesNet must be acyclic"
+        return np.array(order, dtype=np.intp)
+
+    @classmethod
+    def from_arrays(cls, variables: List[str], parent_offsets: np.ndarray, parent_ids: np.ndarray,
+                    cpts: np.ndarray) -> 'CompiledBayesNet':
+        """Build a BayesNet with BayesNet.from_arrays and compile it."""
+        return cls(BayesNet.from_arrays(variables, parent_offsets, parent_ids, cpts))
+
+    def add(self, node_spec: Union[str, List[str], float, dict]):
+        raise TypeError("CompiledBayesNet is frozen; add nodes to a BayesNet and compile it again")
+
+    def variable_id(self, var: str) -> int:
+        """Return the integer id of the variable named var."""
+        try:
+            return self.ids[var]
+        except KeyError:
+            raise Exception("No such variable: {}".format(var))
+
+    def compile(self) -> 'CompiledBayesNet':
+        return self
+
     def __repr__(self) -> str:
-        return 'BayesNet({0!r})'.format(self.nodes)
\ No newline at end of file
+        return 'CompiledBayesNet({0!r})'.format(self.nodes)
\ No newline at end of file
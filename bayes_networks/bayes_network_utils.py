@@ -4,6 +4,8 @@ Functions:
 - extend: Returns a copy of a dictionary extended by setting a variable to a value.
 - enumerate_all: Returns the sum of entries in a probability distribution consistent with given evidence.
 - enumeration_ask: Returns the conditional probability distribution of a variable given evidence.
+- mpe_ask: Returns the most probable explanation, the most likely values of all unobserved variables.
+- map_ask: Returns the most likely joint values of some variables, summing over the others.
 
 University: University of Peloponnese, Department of Informatics and Telecommunications
 
@@ -13,9 +15,14 @@ Authors:
 - Giannopoulos Georgios
 - Giannopoulos Ioannis
 """
+import math
+from typing import Dict, Iterable, List, Sequence, Tuple, Union
 from probability_distribution.probdist import ProbDist
 from bayes_networks.bayes_node import BayesNode
 from bayes_networks.bayes_net import BayesNet
+from bayes_networks.factor import Factor, make_factor, multiply_all
+from bayes_networks.variable_elimination import elimination_order
+from instrumentation import metrics
 
 def extend(s, var, val):
     """Copy dict s and extend it by setting var to val; return copy."""
@@ -26,6 +33,8 @@ def enumerate_all(variables, e, bn):
     consistent with e, where P is the joint distribution represented
     by bn, and e{others} means e restricted to bn's other variables
     (the ones other than variables). Parents must precede children in variables."""
+    if metrics.active is not None:
+        metrics.active.count('enumerate_all.calls')
     if not variables:
         return 1.0
     Y, rest = variables[0], variables[1:]
@@ -47,6 +56,83 @@ def enumeration_ask(X, e, bn):
     'False: 0.716, True: 0.284'"""
     assert X not in e, "Query variable must be distinct from evidence"
     Q = ProbDist(X)
-    for xi in bn.variable_values(X):
-        Q[xi] = enumerate_all(bn.variables, extend(e, X, xi), bn)
-    return Q.normalize()
\ No newline at end of file
+    with metrics.timed('enumeration_ask'):
+        for xi in bn.variable_values(X):
+            Q[xi] = enumerate_all(bn.variables, extend(e, X, xi), bn)
+    return Q.normalize()
+
+
+def _max_product(factors: List[Factor], sum_vars: List[str], max_vars: List[str]) -> Tuple[Dict[str, bool], float]:
+    """Sum sum_vars and then maximize max_vars out of the product of factors,
+    in the given orders, and trace the maximizing values of max_vars back.
+    Return them with the natural log of the maximum. Every new factor is
+    scaled so that its largest entry is 1 (the log of the scale is kept
+    aside), so that products over many variables cannot underflow."""
+    maximized = set(max_vars)
+    log_scale = 0.0
+    traceback = []
+    for var in sum_vars + max_vars:
+        relevant = [f for f in factors if var in f.variables]
+        factors = [f for f in factors if var not in f.variables]
+        product = multiply_all(relevant)
+        if var in maximized:
+            traceback.append((var, product))
+            new = product.max_out(var)
+        else:
+            new = product.sum_out(var)
+        peak = new.table.max()
+        if peak > 0:
+            new = Factor(new.variables, new.table / peak)
+            log_scale += math.log(peak)
+        factors.append(new)
+    rest = float(multiply_all(factors).table)
+    # The variables of the product factor of a maximized variable are eliminated
+    # after it, so going backwards they are already assigned when it is reached.
+    assignment: Dict[str, bool] = {}
+    for var, product in reversed(traceback):
+        for other in product.variables:
+            if other != var:
+                product = product.restrict(other, assignment[other])
+        assignment[var] = bool(product.table.argmax())
+    return assignment, (log_scale + math.log(rest)) if rest > 0 else -math.inf
+
+
+def mpe_ask(e: Dict[str, bool], bn: BayesNet, order: Union[str, Sequence[str]] = 'min_fill') -> Tuple[Dict[str, bool], float]:
+    """
+    Return the most probable explanation of evidence e: the values x of all
+    the unobserved variables that maximize P(x, e), and log P(x, e) (-inf if
+    e is impossible). Found by max-product variable elimination with
+    traceback, in time exponential only in the width of the elimination
+    order (see variable_elimination.elimination_order), not in the number
+    of variables.
+    >>> sorted(mpe_ask(dict(JohnCalls=T, MaryCalls=T), burglary)[0].items())
+    [('Alarm', True), ('Burglary', False), ('Earthquake', False)]"""
+    factors = [make_factor(node, e) for node in bn.nodes]
+    hidden = [var for var in bn.variables if var not in e]
+    return _max_product(factors, [], elimination_order(factors, hidden, order))
+
+
+def map_ask(X: Union[str, Iterable[str]], e: Dict[str, bool], bn: BayesNet,
+            order: Union[str, Sequence[str]] = 'min_fill') -> Tuple[Dict[str, bool], float]:
+    """
+    Return the maximum a posteriori values of the query variables X (a
+    name or several): the values x that maximize P(X=x, e), summing over
+    the other unobserved variables, and log P(X=x, e). The other variables
+    are summed out first and X then maximized out, each group in the given
+    order (a heuristic name, or a sequence of the unobserved variables).
+    Variables that are not ancestors of X or e are left out, as they sum to 1.
+    >>> sorted(map_ask(['Burglary', 'Earthquake'], dict(JohnCalls=T, MaryCalls=T), burglary)[0].items())
+    [('Burglary', False), ('Earthquake', False)]"""
+    X = [X] if isinstance(X, str) else list(X)
+    assert not set(X) & set(e), "Query variables must be distinct from evidence"
+    relevant = bn.ancestors(X + list(e))
+    factors = [make_factor(node, e) for node in bn.nodes if node.variable in relevant]
+    hidden = [var for var in bn.variables if var in relevant and var not in e and var not in X]
+    if isinstance(order, str):
+        sum_order = elimination_order(factors, hidden, order)
+        max_order = elimination_order(factors, X, order)
+    else:
+        sum_order = [var for var in order if var in hidden]
+        max_order = [var for var in order if var in X]
+        assert len(sum_order) + len(max_order) == len(hidden) + len(X), "Elimination order must list every unobserved variable"
+    return _max_product(factors, sum_order, max_order)
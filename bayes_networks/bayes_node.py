@@ -11,6 +11,7 @@ Functions:
 - probability: Returns True with a probability p.
 
 The BayesNode class has methods for: 
+- computing the CPT row index of an event
 - calculating conditional probabilities
 - sampling from the distribution.
 
@@ -23,8 +24,9 @@ Authors:
 - Giannopoulos Ioannis
 """
 import random
-from typing import Dict, List, Tuple, Union
-from probability_distribution.probdist import event_values
+from typing import Dict, List, Optional, Tuple, Union
+import numpy as np
+from instrumentation import metrics
 
 def probability(p: float) -> bool:
     """Return true with probability p."""
@@ -34,7 +36,9 @@ class BayesNode:
     """A conditional probability distribution for a boolean variable,
     P(X | parents). Part of a BayesNet."""
 
-    def __init__(self, X: str, parents: Union[str, List[str]], cpt: Union[float, Dict[Union[bool, Tuple[bool, ...]], float]]):
+    __slots__ = ('variable', 'parents', 'cpt', 'ptrue', 'children')
+
+    def __init__(self, X: str, parents: Union[str, List[str]], cpt: Union[float, Dict[Union[bool, Tuple[bool, ...]], float], np.ndarray]):
         """X is a variable name, and parents a sequence of variable
         names or a space-separated string. cpt, the conditional
         probability table, takes one of these forms:
@@ -50,9 +54,19 @@ class BayesNode:
           values as there are parents. You can use this form always;
           the first two are just conveniences.
 
+        * A NumPy array of 2**len(parents) probabilities P(X=true), in the
+          layout described below. This is the stored form, so it is
+          used as is.
+
         In all cases the probability of X being false is left implicit,
         since it follows from P(X=true).
 
+        The table is stored as a flat NumPy array of P(X=true) with
+        2**len(parents) entries, indexed by the bit pattern of the parent
+        values with the first parent as the most significant bit (see
+        index). So cpt.reshape((2,) * len(parents)) has one axis per parent,
+        where index 0 is False and 1 is True.
+
         >>> X = BayesNode('X', '', 0.2)
         >>> Y = BayesNode('Y', 'P', {T: 0.2, F: 0.7})
         >>> Z = BayesNode('Z', 'P Q',
@@ -61,25 +75,70 @@ class BayesNode:
         if isinstance(parents, str):
             parents = parents.split()
 
-        # We store the table always in the third form above.
-        if isinstance(cpt, (float, int)):  # no parents, 0-tuple
-            cpt = {(): cpt}
-        elif isinstance(cpt, dict):
-            # one parent, 1-tuple
-            if cpt and isinstance(list(cpt.keys())[0], bool):
-                cpt = {(v,): p for v, p in cpt.items()}
-
-        assert isinstance(cpt, dict)
-        for vs, p in cpt.items():
-            assert isinstance(vs, tuple) and len(vs) == len(parents)
-            assert all(isinstance(v, bool) for v in vs)
-            assert 0 <= p <= 1
+        if isinstance(cpt, np.ndarray):
+            table = cpt.astype(float, copy=False).ravel()
+            assert len(table) == 2 ** len(parents)
+            assert ((0 <= table) & (table <= 1)).all()
+        else:
+            # We bring the table to the third form above, then lay it out as an array.
+            if isinstance(cpt, (float, int)):  # no parents, 0-tuple
+                cpt = {(): cpt}
+            elif isinstance(cpt, dict):
+                # one parent, 1-tuple
+                if cpt and isinstance(list(cpt.keys())[0], bool):
+                    cpt = {(v,): p for v, p in cpt.items()}
+
+            assert isinstance(cpt, dict)
+            table = np.full(2 ** len(parents), np.nan)
+            for vs, p in cpt.items():
+                assert isinstance(vs, tuple) and len(vs) == len(parents)
+                assert all(isinstance(v, bool) for v in vs)
+                assert 0 <= p <= 1
+                table[self.index(vs)] = p
+            assert not np.isnan(table).any(), "cpt must give P(X=true) for every combination of parent values"
 
         self.variable: str = X
         self.parents: List[str] = parents
-        self.cpt: Dict[Tuple[bool, ...], float] = cpt
+        self.cpt: np.ndarray = table
+        self.ptrue: List[float] = table.tolist()
+        """cpt as a list of floats, for the scalar lookups of p and sample"""
         self.children: List = []
 
+    @classmethod
+    def from_table(cls, X: str, parents: List[str], table: np.ndarray, ptrue: Optional[List[float]] = None) -> 'BayesNode':
+        """Return a node for a CPT that is already a flat float array in the
+        stored layout, without checking it. For loaders that check a whole
+        network's tables at once (see BayesNet.from_arrays); they can also
+        pass table.tolist() as ptrue if they have it."""
+        node = cls.__new__(cls)
+        node.variable = X
+        node.parents = parents
+        node.cpt = table
+        node.ptrue = table.tolist() if ptrue is None else ptrue
+        node.children = []
+        return node
+
+    def index(self, event: Union[Dict[str, bool], Tuple[bool, ...]]) -> int:
+        """Return the position in cpt of the row for the values of parents
+        in event (or of the tuple of parent values itself).
+        >>> Z = BayesNode('Z', 'P Q',
+        ...    {(T, T): 0.2, (T, F): 0.3, (F, T): 0.5, (F, F): 0.7})
+        >>> Z.index({'P': True, 'Q': False})
+        2"""
+        if isinstance(event, tuple):
+            i = 0
+            for v in event:
+                i = (i << 1) | (1 if v else 0)
+            return i
+        return self._row(event)
+
+    def _row(self, event: Dict[str, bool]) -> int:
+        """index for a dict event, without the tuple case."""
+        i = 0
+        for var in self.parents:
+            i = (i << 1) | (1 if event[var] else 0)
+        return i
+
     def p(self, value: bool, event: Dict[str, bool]) -> float:
         """Return the conditional probability
         P(X=value | parents=parent_values), where parent_values
@@ -89,7 +148,9 @@ class BayesNode:
         >>> bn.p(False, {'Burglary': False, 'Earthquake': True})
         0.375"""
         assert isinstance(value, bool)
-        ptrue = self.cpt[event_values(event, self.parents)]
+        if metrics.active is not None:
+            metrics.active.count('BayesNode.cpt_lookups')
+        ptrue = self.ptrue[self._row(event)]
         return ptrue if value else 1 - ptrue
 
     def sample(self, event: Dict[str, bool]) -> bool:
@@ -97,7 +158,9 @@ class BayesNode:
         on event's values for parent_variables. That is, return True/False
         at random according with the conditional probability given the
         parents."""
-        return probability(self.p(True, event))
+        if metrics.active is not None:
+            metrics.active.count('BayesNode.cpt_lookups')
+        return probability(self.ptrue[self._row(event)])
 
     def __repr__(self) -> str:
         return repr((self.variable, ' '.join(self.parents)))
\ No newline at end of file
@@ -0,0 +1,119 @@
+"""
+## Factor
+
+This module defines the Factor class used by the factor-based inference algorithms
+(variable elimination and friends).
+
+Classes:
+- Factor: A table of non-negative numbers over a list of boolean variables, stored as a
+  NumPy array with one axis of length 2 per variable (index 0 is False, index 1 is True).
+
+Functions:
+- make_factor: Returns the factor for a BayesNode, restricted to the given evidence.
+- multiply_all: Returns the pointwise product of a list of factors.
+
+The Factor class has methods for:
+- multiplying two factors pointwise
+- summing a variable out of a factor
+- maximizing a variable out of a factor
+- summing out every variable but a given few
+- restricting a variable of a factor to an observed value
+- reordering the variables of a factor
+- normalizing a factor.
+
+University: University of Peloponnese, Department of Informatics and Telecommunications
+
+Course: Artificial Intelligence
+
+Authors:
+- Giannopoulos Georgios
+- Giannopoulos Ioannis
+"""
+from functools import reduce
+from typing import Dict, List, Sequence
+import numpy as np
+from bayes_networks.bayes_node import BayesNode
+
+class Factor:
+    """A factor over boolean variables. table[i1, i2, ...] is the value of
+    the factor when variables[0] is bool(i1), variables[1] is bool(i2), ...
+    >>> f = Factor(['A'], [0.25, 0.75])
+    >>> f.restrict('A', True).table
+    array(0.75)
+    """
+
+    def __init__(self, variables: Sequence[str], table):
+        self.variables: List[str] = list(variables)
+        self.table: np.ndarray = np.asarray(table, dtype=float)
+        assert self.table.shape == (2,) * len(self.variables)
+
+    def _expand(self, variables: List[str]) -> np.ndarray:
+        """Return self.table transposed and reshaped so that it broadcasts
+        against a table over variables (a superset of self.variables)."""
+        position = {var: i for i, var in enumerate(variables)}
+        order = sorted(range(len(self.variables)), key=lambda i: position[self.variables[i]])
+        own = set(self.variables)
+        shape = [2 if var in own else 1 for var in variables]
+        return self.table.transpose(order).reshape(shape)
+
+    def pointwise_product(self, other: 'Factor') -> 'Factor':
+        """Multiply two factors, combining their variables."""
+        variables = self.variables + [var for var in other.variables if var not in self.variables]
+        return Factor(variables, self._expand(variables) * other._expand(variables))
+
+    def sum_out(self, var: str) -> 'Factor':
+        """Make a factor eliminating var by summing over its values."""
+        axis = self.variables.index(var)
+        return Factor(self.variables[:axis] + self.variables[axis + 1:], self.table.sum(axis=axis))
+
+    def max_out(self, var: str) -> 'Factor':
+        """Make a factor eliminating var by maximizing over its values
+        (max-product elimination, for most probable explanations)."""
+        axis = self.variables.index(var)
+        return Factor(self.variables[:axis] + self.variables[axis + 1:], self.table.max(axis=axis))
+
+    def marginal(self, variables: Sequence[str]) -> 'Factor':
+        """Make a factor over variables (a subset of self.variables) by
+        summing out all the others at once."""
+        keep = [var for var in self.variables if var in variables]
+        axes = tuple(i for i, var in enumerate(self.variables) if var not in variables)
+        return Factor(keep, self.table.sum(axis=axes))
+
+    def restrict(self, var: str, value: bool) -> 'Factor':
+        """Make a factor fixing var to value."""
+        axis = self.variables.index(var)
+        return Factor(self.variables[:axis] + self.variables[axis + 1:], self.table.take(int(value), axis=axis))
+
+    def transpose(self, variables: Sequence[str]) -> 'Factor':
+        """Return the same factor with its axes in the order of variables
+        (a permutation of self.variables)."""
+        assert sorted(variables) == sorted(self.variables)
+        return Factor(variables, self._expand(list(variables)))
+
+    def normalize(self) -> 'Factor':
+        """Return a copy of this factor scaled so its entries sum to 1."""
+        return Factor(self.variables, self.table / self.table.sum())
+
+    def p(self, event: Dict[str, bool]) -> float:
+        """Look up the value of the factor for the values of its variables in event."""
+        return float(self.table[tuple(int(event[var]) for var in self.variables)])
+
+    def __repr__(self) -> str:
+        return 'Factor({0!r})'.format(self.variables)
+
+
+def make_factor(node: BayesNode, e: Dict[str, bool]) -> Factor:
+    """Return the factor for node's conditional distribution
+    P(node.variable | node.parents), restricted to the evidence e."""
+    variables = node.parents + [node.variable]
+    ptrue = node.cpt.reshape((2,) * len(node.parents))
+    factor = Factor(variables, np.stack([1 - ptrue, ptrue], axis=-1))
+    for var in variables:
+        if var in e:
+            factor = factor.restrict(var, e[var])
+    return factor
+
+
+def multiply_all(factors: List[Factor]) -> Factor:
+    """Return the pointwise product of factors (the empty product is the constant 1)."""
+    return reduce(Factor.pointwise_product, factors, Factor([], 1.0))
@@ -0,0 +1,154 @@
+"""
+## Gibbs sampling
+
+Markov chain Monte Carlo inference for Bayes nets. Each non-evidence variable is resampled
+in turn from its distribution given its Markov blanket, computed from its own CPT and the
+CPTs of its children (BayesNode.children). Many chains are advanced together as rows of one
+boolean NumPy array, and independent blocks of chains run in separate worker processes,
+so throughput grows with the number of chains and cores.
+
+Classes:
+- GibbsProbDist: An EstimatedProbDist that also reports the Gelman-Rubin R-hat of the chains.
+
+Functions:
+- gelman_rubin: Returns the potential scale reduction factor (R-hat) of a set of chains.
+- gibbs_ask: Estimates P(X | e) by Gibbs sampling with several chains, burn-in and thinning.
+
+University: University of Peloponnese, Department of Informatics and Telecommunications
+
+Course: Artificial Intelligence
+
+Authors:
+- Giannopoulos Georgios
+- Giannopoulos Ioannis
+"""
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+import os
+import numpy as np
+from bayes_networks.bayes_net import BayesNet, CompiledBayesNet
+from bayes_networks.sampling import EstimatedProbDist, Seed, cpt_rows
+
+# For each variable to resample: its id, CPT and parent ids, and for every child
+# the child's id, CPT, parent ids and the bit weight of the variable in the child's CPT index.
+BlanketPlan = List[Tuple[int, np.ndarray, np.ndarray, List[Tuple[int, np.ndarray, np.ndarray, int]]]]
+
+class GibbsProbDist(EstimatedProbDist):
+    """An EstimatedProbDist from Gibbs sampling. r_hat is the Gelman-Rubin
+    statistic of the chains (values close to 1 indicate convergence), and
+    n_samples is an effective sample size derived from the spread of the
+    chain means, so std_error accounts for autocorrelation."""
+
+    def __init__(self, var_name: str = '?', n_samples: float = 0, r_hat: float = float('nan')):
+        super().__init__(var_name, n_samples)
+        self.r_hat: float = r_hat
+
+    def __repr__(self) -> str:
+        return "P({}) ~ {:.0f} samples, R-hat {:.3f}".format(self.var_name, self.n_samples, self.r_hat)
+
+
+def _blanket_plan(bn: CompiledBayesNet, hidden: List[int]) -> BlanketPlan:
+    """Collect the arrays a worker needs to resample each hidden variable."""
+    plan = []
+    for i in hidden:
+        children = []
+        for c in bn.child_ids[i]:
+            parents = bn.parent_ids[c]
+            position = int(np.flatnonzero(parents == i)[0])
+            children.append((int(c), bn.nodes[c].cpt, parents, 1 << (len(parents) - 1 - position)))
+        plan.append((i, bn.nodes[i].cpt, bn.parent_ids[i], children))
+    return plan
+
+
+def _run_chains(plan: BlanketPlan, n_vars: int, evidence: Dict[int, bool], X: int,
+                n_chains: int, N: int, burn_in: int, thin: int, seed) -> np.ndarray:
+    """Advance n_chains chains together and return the kept values of X,
+    an array of shape (n_chains, N)."""
+    rng = np.random.default_rng(seed)
+    state = rng.random((n_chains, n_vars)) < 0.5
+    for i, val in evidence.items():
+        state[:, i] = val
+    kept = np.empty((n_chains, N), dtype=bool)
+    sweeps = burn_in + N * thin
+    for sweep in range(sweeps):
+        for i, cpt, parents, children in plan:
+            ptrue = cpt[cpt_rows(state, parents)]
+            w_true, w_false = ptrue, 1 - ptrue
+            for c, child_cpt, child_parents, bit in children:
+                row = cpt_rows(state, child_parents)
+                c_true, c_false = child_cpt[row | bit], child_cpt[row & ~bit]
+                value = state[:, c]
+                w_true = w_true * np.where(value, c_true, 1 - c_true)
+                w_false = w_false * np.where(value, c_false, 1 - c_false)
+            total = w_true + w_false
+            with np.errstate(invalid='ignore', divide='ignore'):
+                p = np.where(total > 0, w_true / total, state[:, i])
+            state[:, i] = rng.random(n_chains) < p
+        done = sweep - burn_in + 1
+        if done > 0 and done % thin == 0:
+            kept[:, done // thin - 1] = state[:, X]
+    return kept
+
+
+def gelman_rubin(chains: np.ndarray) -> float:
+    """Return the potential scale reduction factor R-hat of chains, an
+    array of shape (number of chains, samples per chain). Needs at least
+    two chains of at least two samples."""
+    m, n = chains.shape
+    assert m >= 2 and n >= 2, "R-hat needs at least two chains of two samples"
+    chains = chains.astype(float)
+    means = chains.mean(axis=1)
+    B = n * means.var(ddof=1)
+    W = chains.var(axis=1, ddof=1).mean()
+    if W == 0:
+        return 1.0 if B == 0 else float('inf')
+    var_hat = (n - 1) / n * W + B / n
+    return float(np.sqrt(var_hat / W))
+
+
+def gibbs_ask(X: str, e: Dict[str, bool], bn: BayesNet, N: int = 1000, chains: int = 4,
+              burn_in: int = 100, thin: int = 1, processes: Optional[int] = 1,
+              rng: Seed = None) -> GibbsProbDist:
+    """
+    [Figure 14.16]
+    Estimate P(X | e) by Gibbs sampling. Runs chains independent chains,
+    discards the first burn_in sweeps of each, then keeps every thin-th
+    sweep until N samples per chain are collected. The chains are split
+    into blocks run in up to processes worker processes (at most one per
+    chain; None uses one per CPU, and the default 1 runs in this process).
+    rng seeds the per-block generators, so results are reproducible for a
+    given seed and number of processes.
+    """
+    assert X not in e, "Query variable must be distinct from evidence"
+    assert chains >= 1 and N >= 1 and thin >= 1 and burn_in >= 0
+    bn = bn.compile()
+    evidence = {bn.variable_id(var): bool(val) for var, val in e.items()}
+    hidden = [int(i) for i in bn.topological_order if int(i) not in evidence]
+    plan = _blanket_plan(bn, hidden)
+    x = bn.variable_id(X)
+
+    processes = min(processes or os.cpu_count() or 1, chains)
+    blocks = [len(block) for block in np.array_split(np.arange(chains), processes)]
+    if isinstance(rng, np.random.Generator):
+        rng = int(rng.integers(2 ** 63))
+    seeds = np.random.SeedSequence(rng).spawn(processes)
+    args = [(plan, len(bn.nodes), evidence, x, n, N, burn_in, thin, seed) for n, seed in zip(blocks, seeds)]
+    if processes == 1:
+        results = [_run_chains(*a) for a in args]
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            results = list(pool.map(_run_chains, *zip(*args)))
+    samples = np.concatenate(results)
+
+    r_hat = gelman_rubin(samples) if chains >= 2 and N >= 2 else float('nan')
+    p_true = float(samples.mean())
+    total = samples.size
+    n_eff = float(total)
+    if chains >= 2:
+        var_of_mean = samples.mean(axis=1).var(ddof=1) / chains
+        if var_of_mean > 0:
+            n_eff = min(n_eff, p_true * (1 - p_true) / var_of_mean)
+    Q = GibbsProbDist(X, n_eff, r_hat)
+    for xi in bn.variable_values(X):
+        Q[xi] = p_true if xi else 1 - p_true
+    return Q.normalize()
@@ -0,0 +1,185 @@
+"""
+## Junction tree
+
+This module defines the JunctionTree class, which compiles a BayesNet once into a tree of
+cliques and answers posterior marginals for all variables by message passing.
+
+Classes:
+- JunctionTree: A clique tree of a BayesNet with cached messages. Evidence can be added or
+  retracted one variable at a time; only the messages that depend on the changed clique are
+  dropped, and they are recomputed lazily along the path to the next queried clique.
+
+The JunctionTree class has methods for:
+- adding, retracting and replacing evidence
+- computing the posterior distribution of one variable
+- computing the posterior distributions of all variables at once.
+
+University: University of Peloponnese, Department of Informatics and Telecommunications
+
+Course: Artificial Intelligence
+
+Authors:
+- Giannopoulos Georgios
+- Giannopoulos Ioannis
+"""
+from typing import Dict, List, Sequence, Tuple, Union
+from probability_distribution.probdist import ProbDist
+from bayes_networks.bayes_net import BayesNet
+from bayes_networks.factor import Factor, make_factor, multiply_all
+from bayes_networks.variable_elimination import elimination_cliques, elimination_order
+
+class JunctionTree:
+    """A junction tree (clique tree) for a BayesNet.
+    >>> jt = JunctionTree(burglary)
+    >>> jt.set_evidence('JohnCalls', T); jt.set_evidence('MaryCalls', T)
+    >>> jt.marginal('Burglary').show_approx()
+    'False: 0.716, True: 0.284'
+    """
+
+    def __init__(self, bn: BayesNet, order: Union[str, Sequence[str]] = 'min_fill'):
+        """Triangulate bn's moral graph with the given elimination order
+        (see variable_elimination.elimination_order), build the tree of its
+        cliques and assign each node's CPT to a clique holding its family."""
+        self.bn = bn
+        factors = [make_factor(node, {}) for node in bn.nodes]
+        order = elimination_order(factors, bn.variables, order)
+        position = {var: i for i, var in enumerate(order)}
+        raw = elimination_cliques(factors, order)
+
+        # The clique of each eliminated variable hangs below the clique of the
+        # next variable of it to be eliminated. A parent contained in one of
+        # its children is not maximal, so it is merged into that child.
+        parent = [min((position[v] for v in clique if v != order[step]), default=None)
+                  for step, clique in enumerate(raw)]
+        children: List[List[int]] = [[] for _ in raw]
+        for step, p in enumerate(parent):
+            if p is not None:
+                children[p].append(step)
+        self.cliques: List[List[str]] = []
+        node_of: List[int] = []
+        for step, clique in enumerate(raw):
+            merged = next((node_of[c] for c in children[step] if clique <= set(self.cliques[node_of[c]])), None)
+            if merged is None:
+                merged = len(self.cliques)
+                self.cliques.append(sorted(clique, key=position.get))
+            node_of.append(merged)
+
+        self.neighbours: List[List[int]] = [[] for _ in self.cliques]
+        roots = []
+        for step, p in enumerate(parent):
+            if p is None:
+                roots.append(node_of[step])
+            elif node_of[step] != node_of[p]:
+                self._connect(node_of[step], node_of[p])
+        for a, b in zip(roots, roots[1:]):
+            self._connect(a, b)
+
+        self.home: Dict[str, int] = {var: node_of[position[var]] for var in bn.variables}
+        assigned: List[List[Factor]] = [[] for _ in self.cliques]
+        for factor in factors:
+            first = min(factor.variables, key=position.get)
+            assigned[node_of[position[first]]].append(factor)
+        self.potentials: List[Factor] = [multiply_all(fs) for fs in assigned]
+
+        self.evidence: Dict[str, bool] = {}
+        self._evidence_potentials: Dict[int, Factor] = {}
+        self._messages: Dict[Tuple[int, int], Factor] = {}
+        self._beliefs: Dict[int, Factor] = {}
+
+    def _connect(self, a: int, b: int):
+        self.neighbours[a].append(b)
+        self.neighbours[b].append(a)
+
+    def _invalidate(self, clique: int):
+        """Forget everything that depends on the evidence in clique: its
+        evidence potential, every message directed away from it and all
+        beliefs. Messages directed towards it stay valid."""
+        self._evidence_potentials.pop(clique, None)
+        self._beliefs.clear()
+        stack = [(clique, None)]
+        while stack:
+            node, came_from = stack.pop()
+            for n in self.neighbours[node]:
+                if n != came_from:
+                    self._messages.pop((node, n), None)
+                    stack.append((n, node))
+
+    def set_evidence(self, var: str, value: bool):
+        """Observe var = value, replacing any earlier observation of var."""
+        assert var in self.home, "No such variable: {}".format(var)
+        value = bool(value)
+        if self.evidence.get(var) is not value:
+            self.evidence[var] = value
+            self._invalidate(self.home[var])
+
+    def retract_evidence(self, var: str):
+        """Forget the observation of var, if any."""
+        if var in self.evidence:
+            del self.evidence[var]
+            self._invalidate(self.home[var])
+
+    def update_evidence(self, e: Dict[str, bool]):
+        """Make e the complete evidence, changing only the variables that differ."""
+        for var in [var for var in self.evidence if var not in e]:
+            self.retract_evidence(var)
+        for var, value in e.items():
+            self.set_evidence(var, value)
+
+    def _potential(self, clique: int) -> Factor:
+        """The clique's CPT potential times the indicators of the evidence
+        on its variables."""
+        if clique not in self._evidence_potentials:
+            factor = self.potentials[clique]
+            for var, value in self.evidence.items():
+                if self.home[var] == clique:
+                    factor = factor.pointwise_product(Factor([var], [float(not value), float(value)]))
+            self._evidence_potentials[clique] = factor
+        return self._evidence_potentials[clique]
+
+    def _message(self, i: int, j: int) -> Factor:
+        """Compute the message from clique i to neighbour j, assuming the
+        messages into i from its other neighbours are cached."""
+        factors = [self._potential(i)] + [self._messages[(n, i)] for n in self.neighbours[i] if n != j]
+        message = multiply_all(factors).marginal(self.cliques[j])
+        total = message.table.sum()
+        return message.normalize() if total > 0 else message
+
+    def _collect(self, clique: int):
+        """Make sure all messages into clique are cached, computing the
+        missing ones from the leaves inwards."""
+        visits = []
+        stack = [(clique, None)]
+        while stack:
+            node, towards = stack.pop()
+            visits.append((node, towards))
+            for n in self.neighbours[node]:
+                if n != towards and (n, node) not in self._messages:
+                    stack.append((n, node))
+        for node, towards in reversed(visits):
+            if towards is not None:
+                self._messages[(node, towards)] = self._message(node, towards)
+
+    def belief(self, clique: int) -> Factor:
+        """Return the (unnormalized) joint distribution of the clique's
+        variables and the evidence."""
+        if clique not in self._beliefs:
+            self._collect(clique)
+            factors = [self._potential(clique)] + [self._messages[(n, clique)] for n in self.neighbours[clique]]
+            self._beliefs[clique] = multiply_all(factors)
+        return self._beliefs[clique]
+
+    def marginal(self, X: str) -> ProbDist:
+        """Return the posterior distribution P(X | evidence).
+        Raises a ZeroDivisionError if the evidence is impossible."""
+        result = self.belief(self.home[X]).marginal([X])
+        Q = ProbDist(X)
+        for xi in self.bn.variable_values(X):
+            Q[xi] = result.p({X: xi})
+        return Q.normalize()
+
+    def marginals(self) -> Dict[str, ProbDist]:
+        """Return the posterior distribution of every variable given the evidence."""
+        return {var: self.marginal(var) for var in self.bn.variables}
+
+    def __repr__(self) -> str:
+        return 'JunctionTree({0!r})'.format([' '.join(clique) for clique in self.cliques])
@@ -0,0 +1,310 @@
+"""
+## Parameter learning
+
+This module fits the CPTs of a BayesNet of known structure to a table of observed cases, one row
+per case and one column per variable. For every node, the cases are counted per CPT row with
+np.bincount over the bit patterns of the parent values (the same row index BayesNode.index
+computes), so a whole column is counted with a few NumPy operations. A Beta (two-valued
+Dirichlet) prior adds alpha pseudo-cases of each value to every row; alpha=1 is Laplace
+smoothing and alpha=0 gives maximum-likelihood estimates.
+
+Missing values are handled with expectation-maximization: every incomplete case is split into
+its completions, weighted by their posterior probability under the current CPTs, and the
+expected counts are refitted until the CPTs stop changing. The complete cases are counted once,
+and the completions of the incomplete ones are built once and kept (as one small integer per
+completion and node), so an EM iteration only reweights them. Cases are counted in chunks of
+rows, in worker processes if asked to; the table and then the completions are copied to shared
+memory once, and each iteration sends the workers only the current CPTs.
+
+Functions:
+- load_columns: Reads a column-wise table (.npz with one array per variable, or .csv).
+- count_family: Returns the per-row counts of a node's CPT.
+- fit_bayes_net: Fits the CPTs of a network structure to data, with EM for missing values.
+
+University: University of Peloponnese, Department of Informatics and Telecommunications
+
+Course: Artificial Intelligence
+
+Authors:
+- Giannopoulos Georgios
+- Giannopoulos Ioannis
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+from functools import partial
+from multiprocessing.shared_memory import SharedMemory
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple, Union
+import numpy as np
+from bayes_networks.bayes_net import BayesNet
+
+# (column of the node, columns of its parents) for every node
+Families = List[Tuple[int, np.ndarray]]
+
+MAX_MISSING_PER_ROW = 16
+"""Largest number of missing values in one case; EM enumerates the 2**m completions of a case"""
+
+def load_columns(filename: str) -> Dict[str, np.ndarray]:
+    """
+    Read a column-wise table: an .npz file holding one array per variable (as written by
+    np.savez), or a .csv file with a header row of variable names and 0/1 values. Missing
+    values are NaN (an empty .csv field) or -1.
+    """
+    if filename.endswith('.npz'):
+        with np.load(filename) as f:
+            return {name: f[name] for name in f.files}
+    table = np.genfromtxt(filename, delimiter=',', names=True, dtype=float, missing_values='', filling_values=np.nan)
+    return {name: table[name] for name in table.dtype.names}
+
+
+def _as_table(data: Union[np.ndarray, Mapping[str, np.ndarray]], variables: List[str],
+              columns: Optional[Sequence[str]]) -> Tuple[np.ndarray, np.ndarray]:
+    """Return the values (bool) and the missing mask of data, with one column per variable."""
+    if isinstance(data, Mapping):
+        table = np.column_stack([np.asarray(data[var]) for var in variables])
+    else:
+        table = np.asarray(data)
+        assert table.ndim == 2, "data must be a 2-D array"
+        if columns is not None:
+            position = {var: i for i, var in enumerate(columns)}
+            table = table[:, [position[var] for var in variables]]
+        assert table.shape[1] == len(variables), "data must have one column per variable"
+    if table.dtype == bool:
+        return table, np.zeros(table.shape, dtype=bool)
+    table = table.astype(float)
+    missing = np.isnan(table) | (table < 0)
+    return (table > 0) & ~missing, missing
+
+
+def _family_index(values: np.ndarray, child: int, parents: np.ndarray) -> np.ndarray:
+    """Index of every case in the family table of a node: twice its CPT row (first parent as
+    the most significant bit, as in BayesNode.index) plus its own value."""
+    index = np.zeros(len(values), dtype=np.intp)
+    for column in [*parents, child]:
+        index <<= 1
+        index |= values[:, column]
+    return index
+
+
+def count_family(values: np.ndarray, child: int, parents: np.ndarray,
+                 weights: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Count (or add up the weights of) the cases in every row of a node's CPT.
+
+    Args:
+        - values (np.ndarray): Boolean array of cases, one column per variable.
+        - child (int): Column of the node.
+        - parents (np.ndarray): Columns of its parents, in CPT order.
+        - weights (np.ndarray, optional): Weight of every case. Defaults to 1 each.
+
+    Returns:
+        - n_true (np.ndarray): Cases with the node True, per CPT row.
+        - n_total (np.ndarray): All cases, per CPT row.
+    """
+    return _split_counts(np.bincount(_family_index(values, child, parents), weights=weights, minlength=2 << len(parents)))
+
+
+def _split_counts(counts: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """n_true and n_total per CPT row from counts per family table entry."""
+    counts = counts.astype(float, copy=False)
+    return counts[1::2], counts[0::2] + counts[1::2]
+
+
+def _completions(values: np.ndarray, missing: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Return every completion of the incomplete cases and the index of the case each comes from."""
+    n_missing = missing.sum(axis=1)
+    assert n_missing.max(initial=0) <= MAX_MISSING_PER_ROW, "too many missing values in one case"
+    completed, source = [], []
+    for m in np.unique(n_missing).tolist():
+        cases = np.flatnonzero(n_missing == m)
+        # the columns of the missing values of every case, in column order
+        columns = np.argsort(~missing[cases], axis=1, kind='stable')[:, :m]
+        bits = ((np.arange(1 << m)[:, None] >> np.arange(m - 1, -1, -1)) & 1).astype(bool)
+        filled = np.repeat(values[cases], 1 << m, axis=0)
+        rows = np.arange(len(filled))[:, None]
+        filled[rows, np.repeat(columns, 1 << m, axis=0)] = np.tile(bits, (len(cases), 1))
+        completed.append(filled)
+        source.append(np.repeat(cases, 1 << m))
+    return np.concatenate(completed), np.concatenate(source)
+
+
+def _complete_counts(values: np.ndarray, missing: np.ndarray, families: Families) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """Counts of the complete cases of a chunk."""
+    complete = values[~missing.any(axis=1)]
+    return [count_family(complete, child, parents) for child, parents in families]
+
+
+def _expand(values: np.ndarray, missing: np.ndarray, families: Families) -> Tuple[List[np.ndarray], np.ndarray]:
+    """The completions of the incomplete cases of a chunk, as the family table index of every
+    completion for every node (in the smallest unsigned type that fits) and the case each
+    completion comes from. They do not depend on the CPTs, so EM computes them once per chunk."""
+    incomplete = missing.any(axis=1)
+    if not incomplete.any():
+        return [np.zeros(0, dtype=np.uint8) for _ in families], np.zeros(0, dtype=np.intp)
+    filled, source = _completions(values[incomplete], missing[incomplete])
+    indices = [_family_index(filled, child, parents).astype(np.min_scalar_type((2 << len(parents)) - 1))
+               for child, parents in families]
+    return indices, source.astype(np.min_scalar_type(len(values)))
+
+
+def _expected_counts(indices: List[np.ndarray], source: np.ndarray, cpts: List[np.ndarray]) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """Expected counts of the incomplete cases of a chunk (see _expand), each completion
+    weighted by its posterior probability under cpts."""
+    if len(source) == 0:
+        return [(0.0, 0.0)] * len(cpts)
+    log_joint = np.zeros(len(source))
+    with np.errstate(divide='ignore'):
+        for index, cpt in zip(indices, cpts):
+            # log P(child = value | parents) per family table entry
+            log_joint += np.log(np.stack([1 - cpt, cpt], axis=1).ravel())[index]
+    # normalize the weights of the completions of every case (log-sum-exp per case)
+    peak = np.full(int(source.max()) + 1, -np.inf)
+    np.maximum.at(peak, source, log_joint)
+    peak = np.where(np.isfinite(peak), peak, 0.0)
+    weights = np.exp(log_joint - peak[source])
+    totals = np.bincount(source, weights=weights)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        weights = np.nan_to_num(weights / totals[source])
+    return [_split_counts(np.bincount(index, weights=weights, minlength=2 * len(cpt)))
+            for index, cpt in zip(indices, cpts)]
+
+
+def _first_pass(values: np.ndarray, missing: np.ndarray, families: Families
+                ) -> Tuple[List[Tuple[np.ndarray, np.ndarray]], Tuple[List[np.ndarray], np.ndarray]]:
+    """The counts of the complete cases of a chunk and the completions of its incomplete ones."""
+    return _complete_counts(values, missing, families), _expand(values, missing, families)
+
+
+_worker_table = {}
+"""The shared-memory arrays of fit_bayes_net mapped in a worker process: the cases and families
+(set by _attach_table) and, once built, the completions of all the chunks"""
+
+def _attach_table(names: Tuple[str, str], shape: Tuple[int, int], families: Families):
+    """Pool initializer: map the shared-memory copies of the values and missing mask."""
+    for key, name in zip(('values', 'missing'), names):
+        memory = SharedMemory(name=name)
+        _worker_table[key + '_memory'] = memory  # keeps the mapping open
+        _worker_table[key] = np.ndarray(shape, dtype=bool, buffer=memory.buf)
+    _worker_table['families'] = families
+
+
+def _shared_first_pass(start: int, stop: int):
+    """_first_pass of rows start:stop of the table attached by _attach_table."""
+    return _first_pass(_worker_table['values'][start:stop], _worker_table['missing'][start:stop],
+                       _worker_table['families'])
+
+
+def _shared_array(name: str, shape: Tuple[int, ...], dtype) -> np.ndarray:
+    """Map (once per worker) a shared-memory array created by fit_bayes_net."""
+    if name not in _worker_table:
+        memory = SharedMemory(name=name)
+        _worker_table[name] = (memory, np.ndarray(shape, dtype=dtype, buffer=memory.buf))
+    return _worker_table[name][1]
+
+
+def _shared_expected_counts(completions: Tuple, sources: Tuple, start: int, stop: int,
+                            cpts: List[np.ndarray]) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """_expected_counts of the completions start:stop of the shared completion arrays, given
+    as (name, shape, dtype): the family table indices (one row per node) and the cases."""
+    indices = _shared_array(*completions)[:, start:stop]
+    return _expected_counts(list(indices), _shared_array(*sources)[start:stop], cpts)
+
+
+def fit_bayes_net(structure: Union[BayesNet, Sequence[Tuple[str, Union[str, List[str]]]]],
+                  data: Union[np.ndarray, Mapping[str, np.ndarray]], columns: Optional[Sequence[str]] = None,
+                  alpha: float = 1.0, processes: Optional[int] = 1, chunk_size: int = 1 << 20,
+                  max_iterations: int = 100, tol: float = 1e-6) -> BayesNet:
+    """
+    Fit the CPTs of a network structure to a table of cases.
+
+    Args:
+        - structure: A BayesNet whose structure is kept (its CPTs are ignored), or a list of
+          (variable, parents) pairs with parents before children.
+        - data: The cases, as a 2-D array with one column per variable, or a mapping from variable
+          to column (e.g. from load_columns). Boolean arrays have no missing values; in numeric
+          arrays, values > 0 are True, 0 is False, and NaN or negative values are missing.
+        - columns (sequence, optional): The variable of every column of an array. Defaults to the
+          variables of structure, in order.
+        - alpha (float, optional): Pseudo-count of each value in every CPT row (1 is Laplace
+          smoothing, 0 maximum likelihood; rows without cases then get 0.5). Defaults to 1.
+        - processes (int, optional): Number of worker processes counting chunks of cases. None
+          uses all CPU cores. Defaults to 1 (no pool).
+        - chunk_size (int, optional): Number of cases counted at a time. Defaults to 2^20.
+        - max_iterations (int, optional): Largest number of EM iterations. Defaults to 100.
+        - tol (float, optional): EM stops when no CPT entry changes by more than this. Defaults to 1e-6.
+
+    Returns:
+        - BayesNet: A new network with the fitted CPTs.
+    """
+    if isinstance(structure, BayesNet):
+        structure = [(node.variable, node.parents) for node in structure.nodes]
+    structure = [(var, parents.split() if isinstance(parents, str) else list(parents)) for var, parents in structure]
+    variables = [var for var, _ in structure]
+    position = {var: i for i, var in enumerate(variables)}
+    families = [(position[var], np.array([position[p] for p in parents], dtype=np.intp)) for var, parents in structure]
+
+    values, missing = _as_table(data, variables, columns)
+    bounds = [(i, min(i + chunk_size, len(values))) for i in range(0, max(len(values), 1), chunk_size)]
+    has_missing = bool(missing.any())
+    processes = min(processes or os.cpu_count() or 1, len(bounds))
+
+    def estimate(counts):
+        cpts = []
+        for n_true, n_total in counts:
+            with np.errstate(invalid='ignore', divide='ignore'):
+                cpt = (n_true + alpha) / (n_total + 2 * alpha)
+            cpts.append(np.where(np.isfinite(cpt), cpt, 0.5))
+        return cpts
+
+    def add_up(shards):
+        shards = list(shards)
+        return [(sum(shard[i][0] for shard in shards), sum(shard[i][1] for shard in shards))
+                for i in range(len(families))]
+
+    def share(array: np.ndarray, stack: ExitStack) -> Tuple[str, Tuple[int, ...], np.dtype]:
+        memory = SharedMemory(create=True, size=max(array.nbytes, 1))
+        stack.callback(memory.unlink)
+        stack.callback(memory.close)
+        np.ndarray(array.shape, dtype=array.dtype, buffer=memory.buf)[...] = array
+        return memory.name, array.shape, array.dtype
+
+    with ExitStack() as stack:
+        # First pass: count the complete cases and build the completions of the incomplete ones.
+        if processes > 1:
+            # The cases are copied to shared memory once, and so are the completions after this pass.
+            shared = [share(array, stack)[0] for array in (values, missing)]
+            pool = stack.enter_context(ProcessPoolExecutor(max_workers=processes, initializer=_attach_table,
+                                                           initargs=(tuple(shared), values.shape, families)))
+            first = list(pool.map(_shared_first_pass, *zip(*bounds)))
+        else:
+            first = [_first_pass(values[start:stop], missing[start:stop], families) for start, stop in bounds]
+        # the complete cases count the same in every EM iteration
+        complete_counts = add_up(counts for counts, _ in first)
+        expanded = [completions for _, completions in first if len(completions[1])]
+        del first
+
+        if processes > 1 and expanded:
+            # Lay the completions of all chunks end to end, in shared memory, so that any worker
+            # can reweight any chunk; each iteration then sends only the CPTs and the bounds.
+            ends = np.cumsum([len(source) for _, source in expanded]).tolist()
+            spans = list(zip([0] + ends[:-1], ends))
+            dtype = np.result_type(*[index.dtype for indices, _ in expanded for index in indices])
+            completions = share(np.concatenate([np.stack(indices).astype(dtype, copy=False)
+                                                for indices, _ in expanded], axis=1), stack)
+            sources = share(np.concatenate([source for _, source in expanded]), stack)
+            del expanded
+            expected_counts = lambda cpts: add_up(pool.map(partial(_shared_expected_counts, completions, sources),
+                                                           *zip(*spans), [cpts] * len(spans)))
+        else:
+            expected_counts = lambda cpts: add_up(_expected_counts(indices, source, cpts) for indices, source in expanded)
+
+        cpts = estimate(complete_counts)
+        for _ in range(max_iterations if has_missing else 0):
+            expected = expected_counts(cpts)
+            new = estimate([(n_true + e_true, n_total + e_total)
+                            for (n_true, n_total), (e_true, e_total) in zip(complete_counts, expected)])
+            converged = all(np.abs(a - b).max() <= tol for a, b in zip(new, cpts))
+            cpts = new
+            if converged:
+                break
+    return BayesNet([(var, parents, cpt) for (var, parents), cpt in zip(structure, cpts)])
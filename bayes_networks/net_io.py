@@ -0,0 +1,217 @@
+"""
+## Network files
+
+This module saves and loads BayesNets, so that large networks do not have to be written out as
+Python lists of node specs. There are two formats:
+
+- JSON (.json): a text file {"format": ..., "nodes": [...]} with one node per line, each
+  {"name": ..., "parents": [...], "cpt": [...]} with the CPT in the stored layout of BayesNode
+  (P(X=true) per row, first parent as the most significant bit). It is parsed one node at a
+  time, without holding the whole document in memory.
+- Binary (.npz): an uncompressed NumPy archive of a handful of flat arrays, the variable names
+  (their UTF-8 encodings one after the other, with offsets), the parent ids of all nodes with their offsets, and all the CPTs one after
+  the other. Loading reads each array with a single call, whatever the number of nodes.
+
+Both are loaded through BayesNet.from_arrays, which checks the whole network at once and makes
+every CPT a view of one array. An inference worker can be given the name of a binary file
+instead of a pickled net and load it itself.
+
+Functions:
+- network_arrays: Returns the structure and CPTs of a net as flat arrays.
+- save_json / load_json: Save and load a net as JSON.
+- save_binary / load_binary: Save and load a net as a binary .npz file.
+- save_network / load_network: Save and load a net in the format given by the file extension.
+
+University: University of Peloponnese, Department of Informatics and Telecommunications
+
+Course: Artificial Intelligence
+
+Authors:
+- Giannopoulos Georgios
+- Giannopoulos Ioannis
+"""
+import json
+import re
+from array import array
+from typing import Dict, List, Tuple
+import numpy as np
+from bayes_networks.bayes_net import BayesNet
+
+FORMAT = 'bayes-net-1'
+"""Format tag written to (and required in) JSON and binary files"""
+
+def network_arrays(bn: BayesNet) -> Tuple[List[str], np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Return the variables of bn, the parent offsets and parent ids of its nodes, and all its CPTs
+    concatenated (the arguments of BayesNet.from_arrays).
+    """
+    ids = {var: i for i, var in enumerate(bn.variables)}
+    parent_offsets = np.zeros(len(bn.nodes) + 1, dtype=np.int64)
+    np.cumsum([len(node.parents) for node in bn.nodes], out=parent_offsets[1:])
+    parent_ids = np.fromiter((ids[p] for node in bn.nodes for p in node.parents), dtype=np.int32, count=int(parent_offsets[-1]))
+    cpts = np.concatenate([node.cpt for node in bn.nodes]) if bn.nodes else np.zeros(0)
+    return list(bn.variables), parent_offsets, parent_ids, cpts
+
+
+def save_json(bn: BayesNet, filename: str):
+    """
+    Save bn as JSON, writing one node per line.
+    """
+    with open(filename, 'w', encoding='utf-8') as f:
+        f.write('{"format": "%s", "nodes": [' % FORMAT)
+        for i, node in enumerate(bn.nodes):
+            f.write(',\n' if i else '\n')
+            json.dump({'name': node.variable, 'parents': node.parents, 'cpt': node.cpt.tolist()}, f)
+        f.write('\n]}\n')
+
+
+_WHITESPACE = re.compile(r'\s*')
+
+class _JSONStream:
+    """Reads JSON values one at a time from a text file, holding only a buffer of it in memory."""
+
+    def __init__(self, f, chunk_size: int = 1 << 20):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buffer = ''
+        self.position = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self) -> bool:
+        """Read more of the file (at least as much again as is buffered); False at the end."""
+        if self.eof:
+            return False
+        chunk = self.f.read(max(self.chunk_size, len(self.buffer) - self.position))
+        self.buffer = self.buffer[self.position:] + chunk
+        self.position = 0
+        self.eof = not chunk
+        return not self.eof
+
+    def peek(self) -> str:
+        """Skip whitespace and return the next character ('' at the end of the file)."""
+        while True:
+            match = _WHITESPACE.match(self.buffer, self.position)
+            self.position = match.end()
+            if self.position < len(self.buffer) or not self._fill():
+                return self.buffer[self.position:self.position + 1]
+
+    def expect(self, token: str):
+        """Skip whitespace and the one-character token, which must come next."""
+        if self.peek() != token:
+            raise ValueError(f"Expected {token!r} in network file")
+        self.position += 1
+
+    def value(self):
+        """Decode the next JSON value. In valid JSON a value is always followed by more text,
+        so a value ending at the end of the buffer (e.g. a number cut in two) is read again
+        with more of the file."""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.position)
+                if end < len(self.buffer):
+                    self.position = end
+                    return value
+            except json.JSONDecodeError:
+                pass
+            if not self._fill():
+                raise ValueError("Truncated or malformed network file")
+
+
+def load_json(filename: str) -> BayesNet:
+    """
+    Load a net saved by save_json. The file is parsed incrementally, one node at a time, so only
+    the structure and CPT arrays are kept in memory, not the parsed document. Nodes must be
+    listed with parents before children.
+    """
+    variables: List[str] = []
+    ids: Dict[str, int] = {}
+    n_parents: List[int] = []
+    parent_ids = array('i')
+    cpts = array('d')
+    file_format = None
+    with open(filename, encoding='utf-8') as f:
+        stream = _JSONStream(f)
+        stream.expect('{')
+        first_key = True
+        while stream.peek() != '}':
+            if not first_key:
+                stream.expect(',')
+            first_key = False
+            key = stream.value()
+            stream.expect(':')
+            if key != 'nodes':
+                value = stream.value()
+                if key == 'format':
+                    file_format = value
+                continue
+            stream.expect('[')
+            first_node = True
+            while stream.peek() != ']':
+                if not first_node:
+                    stream.expect(',')
+                first_node = False
+                node = stream.value()
+                name, parents, cpt = node['name'], node['parents'], node['cpt']
+                if name in ids:
+                    raise ValueError(f"Node {name!r} is defined twice in {filename}")
+                if len(cpt) != 2 ** len(parents):
+                    raise ValueError(f"Node {name!r} has {len(parents)} parents, so its CPT needs "
+                                     f"{2 ** len(parents)} entries, but it has {len(cpt)}")
+                try:
+                    parent_ids.extend([ids[p] for p in parents])
+                except KeyError as error:
+                    raise ValueError(f"Unknown parent {error.args[0]!r} of node {name!r} in {filename} "
+                                     "(parents must come before children)") from None
+                ids[name] = len(variables)
+                variables.append(name)
+                n_parents.append(len(parents))
+                cpts.extend(cpt)
+            stream.expect(']')
+    if file_format != FORMAT:
+        raise ValueError(f"{filename} is not a {FORMAT} file")
+    parent_offsets = np.zeros(len(variables) + 1, dtype=np.int64)
+    np.cumsum(n_parents, out=parent_offsets[1:])
+    return BayesNet.from_arrays(variables, parent_offsets, np.frombuffer(parent_ids, dtype=np.int32),
+                                np.frombuffer(cpts, dtype=float))
+
+
+def save_binary(bn: BayesNet, filename: str):
+    """
+    Save bn as an uncompressed .npz file.
+    """
+    variables, parent_offsets, parent_ids, cpts = network_arrays(bn)
+    # a numpy string array would drop trailing NULs, so the names are stored as raw bytes
+    encoded = [var.encode('utf-8') for var in variables]
+    name_offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(name) for name in encoded], out=name_offsets[1:])
+    with open(filename, 'wb') as f:
+        np.savez(f, format=np.array(FORMAT), names=np.frombuffer(b''.join(encoded), dtype=np.uint8),
+                 name_offsets=name_offsets, parent_offsets=parent_offsets, parent_ids=parent_ids, cpts=cpts)
+
+
+def load_binary(filename: str) -> BayesNet:
+    """
+    Load a net saved by save_binary.
+    """
+    with np.load(filename) as f:
+        if 'format' not in f.files or str(f['format']) != FORMAT:
+            raise ValueError(f"{filename} is not a {FORMAT} file")
+        names, name_offsets = f['names'].tobytes(), f['name_offsets'].tolist()
+        variables = [names[start:stop].decode('utf-8') for start, stop in zip(name_offsets, name_offsets[1:])]
+        return BayesNet.from_arrays(variables, f['parent_offsets'], f['parent_ids'], f['cpts'])
+
+
+def save_network(bn: BayesNet, filename: str):
+    """
+    Save bn as JSON if filename ends with .json, and as a binary file otherwise.
+    """
+    (save_json if filename.endswith('.json') else save_binary)(bn, filename)
+
+
+def load_network(filename: str) -> BayesNet:
+    """
+    Load a net saved by save_network.
+    """
+    return (load_json if filename.endswith('.json') else load_binary)(filename)
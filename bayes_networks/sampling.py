@@ -0,0 +1,131 @@
+"""
+## Approximate inference by sampling
+
+Vectorized sampling algorithms for Bayes nets. Instead of drawing one value per node per
+sample, every sampler draws N samples at a time as a boolean NumPy array, visiting the
+nodes of a CompiledBayesNet in topological order and looking up all N CPT rows with one
+integer-index operation per node.
+
+Classes:
+- EstimatedProbDist: A ProbDist produced by sampling, carrying the standard error of each
+  estimate and the (effective) number of samples it is based on.
+
+Functions:
+- cpt_rows: Returns, for every sample, the CPT row index of a node given its sampled parents.
+- prior_sample: Returns N samples from the joint distribution of the net.
+- rejection_sampling: Estimates P(X | e) from the prior samples consistent with e.
+- likelihood_weighting: Estimates P(X | e) from samples weighted by the likelihood of e.
+
+University: University of Peloponnese, Department of Informatics and Telecommunications
+
+Course: Artificial Intelligence
+
+Authors:
+- Giannopoulos Georgios
+- Giannopoulos Ioannis
+"""
+from typing import Dict, Optional, Union
+import numpy as np
+from probability_distribution.probdist import ProbDist
+from bayes_networks.bayes_net import BayesNet, CompiledBayesNet
+
+Seed = Optional[Union[int, np.random.Generator]]
+
+class EstimatedProbDist(ProbDist):
+    """A ProbDist estimated from samples. n_samples is the number of samples
+    (for weighted samples, the effective sample size) the estimate is based
+    on, and after normalize std_error[val] is the standard error of P(val)."""
+
+    def __init__(self, var_name: str = '?', n_samples: float = 0):
+        super().__init__(var_name)
+        self.n_samples: float = n_samples
+        self.std_error: Dict[bool, float] = {}
+
+    def normalize(self) -> 'EstimatedProbDist':
+        super().normalize()
+        self.std_error = {val: float(np.sqrt(p * (1 - p) / self.n_samples)) if self.n_samples else float('inf')
+                          for val, p in self.prob.items()}
+        return self
+
+    def __repr__(self) -> str:
+        return "P({}) ~ {:.0f} samples".format(self.var_name, self.n_samples)
+
+
+def cpt_rows(samples: np.ndarray, parent_ids: np.ndarray) -> np.ndarray:
+    """Return the CPT row index for each sample (row of samples) from the
+    sampled values of the parents, first parent as the most significant bit."""
+    if len(parent_ids) == 0:
+        return np.zeros(len(samples), dtype=np.intp)
+    weights = 1 << np.arange(len(parent_ids) - 1, -1, -1)
+    return samples[:, parent_ids] @ weights
+
+
+def prior_sample(bn: BayesNet, N: int, rng: Seed = None) -> np.ndarray:
+    """[Figure 14.13]
+    Return N samples from the full joint distribution of bn as a boolean
+    array of shape (N, len(bn.variables)); column i is bn.variables[i].
+    rng is a numpy.random.Generator or a seed for one."""
+    bn = bn.compile()
+    rng = np.random.default_rng(rng)
+    samples = np.zeros((N, len(bn.nodes)), dtype=bool)
+    for i in bn.topological_order:
+        ptrue = bn.nodes[i].cpt[cpt_rows(samples, bn.parent_ids[i])]
+        samples[:, i] = rng.random(N) < ptrue
+    return samples
+
+
+def _estimate(X: str, bn: CompiledBayesNet, values: np.ndarray, weights: np.ndarray, n_samples: float) -> EstimatedProbDist:
+    """Build the distribution of X from its sampled values and their weights."""
+    total = float(weights.sum())
+    if total == 0:
+        raise ZeroDivisionError("No samples consistent with the evidence")
+    total_true = float(weights[values].sum())
+    Q = EstimatedProbDist(X, n_samples)
+    for xi in bn.variable_values(X):
+        Q[xi] = total_true if xi else total - total_true
+    return Q.normalize()
+
+
+def rejection_sampling(X: str, e: Dict[str, bool], bn: BayesNet, N: int = 10000, rng: Seed = None) -> EstimatedProbDist:
+    """
+    [Figure 14.14]
+    Estimate the probability distribution of variable X given
+    evidence e in BayesNet bn, using N prior samples and keeping
+    only those consistent with e.
+    Raises a ZeroDivisionError if no sample is consistent with e.
+    """
+    assert X not in e, "Query variable must be distinct from evidence"
+    bn = bn.compile()
+    samples = prior_sample(bn, N, rng)
+    consistent = np.ones(N, dtype=bool)
+    for var, val in e.items():
+        consistent &= samples[:, bn.variable_id(var)] == val
+    accepted = int(consistent.sum())
+    return _estimate(X, bn, samples[consistent, bn.variable_id(X)], np.ones(accepted), accepted)
+
+
+def likelihood_weighting(X: str, e: Dict[str, bool], bn: BayesNet, N: int = 10000, rng: Seed = None) -> EstimatedProbDist:
+    """
+    [Figure 14.15]
+    Estimate the probability distribution of variable X given
+    evidence e in BayesNet bn. Evidence variables are fixed to their
+    observed values and each sample is weighted by the likelihood of e.
+    The standard error uses the effective sample size
+    (sum of weights)**2 / (sum of squared weights).
+    """
+    assert X not in e, "Query variable must be distinct from evidence"
+    bn = bn.compile()
+    rng = np.random.default_rng(rng)
+    observed = {bn.variable_id(var): bool(val) for var, val in e.items()}
+    samples = np.zeros((N, len(bn.nodes)), dtype=bool)
+    weights = np.ones(N)
+    for i in bn.topological_order:
+        ptrue = bn.nodes[i].cpt[cpt_rows(samples, bn.parent_ids[i])]
+        if i in observed:
+            samples[:, i] = observed[i]
+            weights *= ptrue if observed[i] else 1 - ptrue
+        else:
+            samples[:, i] = rng.random(N) < ptrue
+    squared = float((weights ** 2).sum())
+    effective = float(weights.sum()) ** 2 / squared if squared > 0 else 0.0
+    return _estimate(X, bn, samples[:, bn.variable_id(X)], weights, effective)
@@ -0,0 +1,193 @@
+"""
+## Variable elimination for Bayes nets.
+
+Exact inference by summing variables out of a product of factors one at a time,
+an alternative to the plain recursive enumeration of enumeration_ask.
+
+Functions:
+- interaction_graph: Returns the undirected graph connecting variables that share a factor.
+- min_degree_order: Returns an elimination order choosing the variable with the fewest neighbours first.
+- min_fill_order: Returns an elimination order choosing the variable that adds the fewest fill-in edges first.
+- elimination_order: Returns an elimination order for a named heuristic or an explicit sequence.
+- elimination_cliques: Returns the cliques formed by eliminating variables in a given order.
+- eliminate: Sums the given variables out of a list of factors.
+- elimination_ask: Returns the conditional probability distribution of a variable given evidence.
+- elimination_ask_batch: Returns the posteriors of a variable for many rows of evidence at once.
+
+University: University of Peloponnese, Department of Informatics and Telecommunications
+
+Course: Artificial Intelligence
+
+Authors:
+- Giannopoulos Georgios
+- Giannopoulos Ioannis
+"""
+from typing import Dict, List, Optional, Sequence, Set, Union
+import numpy as np
+from probability_distribution.probdist import BatchProbDist, ProbDist
+from bayes_networks.bayes_net import BayesNet
+from bayes_networks.factor import Factor, make_factor, multiply_all
+
+def interaction_graph(factors: List[Factor]) -> Dict[str, Set[str]]:
+    """Return the adjacency sets of the graph with an edge between every
+    two variables that appear together in some factor."""
+    graph: Dict[str, Set[str]] = {}
+    for factor in factors:
+        for var in factor.variables:
+            graph.setdefault(var, set()).update(v for v in factor.variables if v != var)
+    return graph
+
+
+def _remove_from_graph(graph: Dict[str, Set[str]], var: str) -> Set[str]:
+    """Drop var from graph, connecting all its neighbours to each other
+    (the fill-in edges of eliminating var). Returns the neighbours."""
+    neighbours = graph.pop(var)
+    for n in neighbours:
+        graph[n].discard(var)
+        graph[n].update(neighbours - {n})
+    return neighbours
+
+
+def _greedy_order(factors: List[Factor], variables: Sequence[str], cost) -> List[str]:
+    """Repeatedly pick the variable of variables minimizing cost(var, graph),
+    then connect its neighbours and drop it from the graph."""
+    graph = interaction_graph(factors)
+    for var in variables:
+        graph.setdefault(var, set())
+    remaining = list(variables)
+    order = []
+    while remaining:
+        var = min(remaining, key=lambda v: cost(v, graph))
+        _remove_from_graph(graph, var)
+        remaining.remove(var)
+        order.append(var)
+    return order
+
+
+def _degree(var: str, graph: Dict[str, Set[str]]) -> int:
+    return len(graph[var])
+
+
+def _fill_in(var: str, graph: Dict[str, Set[str]]) -> int:
+    neighbours = list(graph[var])
+    return sum(1 for i, a in enumerate(neighbours) for b in neighbours[i + 1:] if b not in graph[a])
+
+
+def min_degree_order(factors: List[Factor], variables: Sequence[str]) -> List[str]:
+    """Order variables for elimination, each time choosing the one with
+    the fewest neighbours in the interaction graph."""
+    return _greedy_order(factors, variables, _degree)
+
+
+def min_fill_order(factors: List[Factor], variables: Sequence[str]) -> List[str]:
+    """Order variables for elimination, each time choosing the one whose
+    elimination adds the fewest new edges to the interaction graph."""
+    return _greedy_order(factors, variables, _fill_in)
+
+
+def elimination_cliques(factors: List[Factor], order: Sequence[str]) -> List[Set[str]]:
+    """Return, for each variable of order, the set of variables it is
+    connected to (itself included) when it is eliminated in that order.
+    These are the cliques of the triangulated interaction graph."""
+    graph = interaction_graph(factors)
+    for var in order:
+        graph.setdefault(var, set())
+    return [_remove_from_graph(graph, var) | {var} for var in order]
+
+
+ORDERINGS = {'min_fill': min_fill_order, 'min_degree': min_degree_order}
+
+def elimination_order(factors: List[Factor], variables: Sequence[str], order: Union[str, Sequence[str]] = 'min_fill') -> List[str]:
+    """Return the order in which to eliminate variables. order is either the
+    name of a heuristic in ORDERINGS or an explicit sequence of the variables."""
+    if isinstance(order, str):
+        if order not in ORDERINGS:
+            raise ValueError("Unknown elimination order: {}".format(order))
+        return ORDERINGS[order](factors, variables)
+    assert set(order) == set(variables), "Elimination order must list exactly the hidden variables"
+    return list(order)
+
+
+def eliminate(factors: List[Factor], variables: Sequence[str]) -> List[Factor]:
+    """Sum each of variables (in the given order) out of the product of
+    factors, multiplying only the factors that mention it."""
+    for var in variables:
+        relevant = [f for f in factors if var in f.variables]
+        factors = [f for f in factors if var not in f.variables]
+        factors.append(multiply_all(relevant).sum_out(var))
+    return factors
+
+
+def elimination_ask(X: str, e: Dict[str, bool], bn: BayesNet, order: Union[str, Sequence[str]] = 'min_fill') -> ProbDist:
+    """
+    [Figure 14.11]
+    Compute bn's P(X|e) by variable elimination. Returns the same
+    distribution as enumeration_ask, in time exponential only in the
+    width of the elimination order instead of the number of hidden variables.
+    >>> elimination_ask('Burglary', dict(JohnCalls=T, MaryCalls=T), burglary
+    ...  ).show_approx()
+    'False: 0.716, True: 0.284'"""
+    assert X not in e, "Query variable must be distinct from evidence"
+    factors = [make_factor(node, e) for node in bn.nodes]
+    hidden = [var for var in bn.variables if var != X and var not in e]
+    factors = eliminate(factors, elimination_order(factors, hidden, order))
+    result = multiply_all(factors)
+    Q = ProbDist(X)
+    for xi in bn.variable_values(X):
+        Q[xi] = result.p({X: xi})
+    return Q.normalize()
+
+
+MAX_BATCH_TABLE_BITS = 20
+"""Largest number of evidence variables for which elimination_ask_batch
+precomputes the full joint table of the query and evidence variables."""
+
+def elimination_ask_batch(X: str, evidence: Union[List[Dict[str, bool]], np.ndarray], bn: BayesNet,
+                          evidence_vars: Optional[Sequence[str]] = None,
+                          order: Union[str, Sequence[str]] = 'min_fill') -> BatchProbDist:
+    """Compute P(X | e) for every row e of evidence in one call.
+
+    evidence is either a list of dicts that all observe the same variables,
+    or a 2-D boolean array whose columns are the variables in evidence_vars.
+    Returns a BatchProbDist with one distribution per row; its array has
+    shape (len(evidence), 2) and columns that follow bn.variable_values(X),
+    i.e. [P(X=True | e), P(X=False | e)] per row.
+
+    The hidden variables are summed out once, leaving the joint table
+    P(X, evidence_vars); each row is then a single integer index into it.
+    When there are more than MAX_BATCH_TABLE_BITS evidence variables the
+    table would be too large, so each distinct row is answered with
+    elimination_ask instead. Rows with impossible evidence come back as nan."""
+    if evidence_vars is None:
+        assert len(evidence) and isinstance(evidence[0], dict), "evidence_vars is required for array evidence"
+        evidence_vars = list(evidence[0].keys())
+    evidence_vars = list(evidence_vars)
+    assert X not in evidence_vars, "Query variable must be distinct from evidence"
+    if len(evidence) and isinstance(evidence[0], dict):
+        rows = np.array([[row[var] for var in evidence_vars] for row in evidence], dtype=bool)
+    else:
+        rows = np.asarray(evidence, dtype=bool)
+    rows = rows.reshape(len(rows), len(evidence_vars))
+
+    if len(evidence_vars) > MAX_BATCH_TABLE_BITS:
+        unique_rows, inverse = np.unique(rows, axis=0, return_inverse=True)
+        answers = np.empty((len(unique_rows), 2))
+        for i, row in enumerate(unique_rows):
+            try:
+                Q = elimination_ask(X, {var: bool(v) for var, v in zip(evidence_vars, row)}, bn, order)
+            except ZeroDivisionError:  # impossible evidence, as in the table path
+                answers[i] = np.nan
+                continue
+            answers[i] = [Q[True], Q[False]]
+        return BatchProbDist(X, bn.variable_values(X), answers[inverse.ravel()], copy=False)
+
+    factors = [make_factor(node, {}) for node in bn.nodes]
+    kept = set(evidence_vars) | {X}
+    hidden = [var for var in bn.variables if var not in kept]
+    factors = eliminate(factors, elimination_order(factors, hidden, order))
+    joint = multiply_all(factors).transpose(evidence_vars + [X]).table.reshape(-1, 2)
+    weights = 1 << np.arange(len(evidence_vars) - 1, -1, -1)
+    posteriors = joint[rows @ weights if len(evidence_vars) else np.zeros(len(rows), dtype=int)]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        posteriors = posteriors / posteriors.sum(axis=1, keepdims=True)
+    return BatchProbDist(X, bn.variable_values(X), posteriors[:, ::-1], copy=False)
@@ -0,0 +1,187 @@
+"""
+## Benchmarks
+
+This module times the Bayes net inference and spam classification code on synthetic inputs
+(see benchmarks.synthetic) and records the results as JSON, so that runs of different versions
+can be compared to catch performance regressions. It needs no network access or dataset.
+
+Run it from the repository root:
+
+    python -m benchmarks.run_benchmarks --output results.json
+    python -m benchmarks.run_benchmarks --quick --compare results.json
+
+Each case is run `repeat` times and reports the minimum and median wall-clock time in seconds;
+the minimum is the figure compared between runs, being the least affected by other load.
+
+Functions:
+- time_call: Returns timing statistics of repeated calls of a function.
+- bench_inference: Times enumeration_ask and elimination_ask on random networks.
+- bench_naive_bayes: Times NaiveBayesClassifier.train and predict on synthetic corpora.
+- bench_cleaning: Times clean_emails on synthetic corpora.
+- run: Runs all benchmarks and returns the results.
+- compare: Returns the cases that got slower than in an earlier results file.
+
+University: University of Peloponnese, Department of Informatics and Telecommunications
+
+Course: Artificial Intelligence
+
+Authors:
+- Giannopoulos Georgios
+- Giannopoulos Ioannis
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Sequence, Tuple
+import numpy as np
+from bayes_networks.bayes_network_utils import enumeration_ask
+from bayes_networks.variable_elimination import elimination_ask
+from data.clean_data import clean_emails
+from naive_bayes.naive_bayes_classifier import NaiveBayesClassifier
+from benchmarks.synthetic import random_bayes_net, random_evidence, synthetic_corpus
+
+# (number of nodes, largest in-degree, evidence density)
+NETWORKS = [(8, 2, 0.25), (12, 3, 0.25), (16, 3, 0.25), (16, 3, 0.5), (18, 4, 0.25), (20, 3, 0.25)]
+QUICK_NETWORKS = [(8, 2, 0.25), (12, 3, 0.25)]
+# (number of emails, vocabulary size)
+CORPORA = [(2000, 5000), (5000, 20000), (10000, 50000)]
+QUICK_CORPORA = [(1000, 5000)]
+
+def time_call(function: Callable[[], object], repeat: int = 5) -> Dict[str, float]:
+    """
+    Call function `repeat` times and return the minimum and median wall-clock time in seconds.
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return {'min': min(times), 'median': statistics.median(times), 'repeat': repeat}
+
+
+def bench_inference(networks: Sequence[Tuple[int, int, float]], repeat: int = 3, seed: int = 0) -> List[dict]:
+    """
+    Time exact inference of the last variable of random networks given random evidence.
+    """
+    results = []
+    for n_nodes, max_parents, density in networks:
+        bn = random_bayes_net(n_nodes, max_parents, seed)
+        X = bn.variables[-1]
+        e = random_evidence(bn, density, seed, exclude=[X])
+        params = {'nodes': n_nodes, 'max_parents': max_parents, 'evidence_density': density}
+        for name, ask in (('enumeration_ask', enumeration_ask), ('elimination_ask', elimination_ask)):
+            results.append({'name': name, 'params': params, **time_call(lambda: ask(X, e, bn), repeat)})
+    return results
+
+
+def bench_naive_bayes(corpora: Sequence[Tuple[int, int]], repeat: int = 3, seed: int = 0) -> List[dict]:
+    """
+    Time training and prediction (with and without log-probabilities) on synthetic corpora.
+    The corpora are cleaned once beforehand, outside the timed calls.
+    """
+    results = []
+    for n_emails, vocabulary_size in corpora:
+        emails, labels = synthetic_corpus(n_emails, vocabulary_size, seed=seed)
+        emails = clean_emails(emails)
+        split = int(0.8 * n_emails)
+        params = {'emails': n_emails, 'vocabulary': vocabulary_size}
+        classifier = NaiveBayesClassifier()
+        results.append({'name': 'NaiveBayesClassifier.train', 'params': params,
+                        **time_call(lambda: classifier.train(emails[:split], labels[:split], True), repeat)})
+        for prevent_underflow in (False, True):
+            results.append({'name': 'NaiveBayesClassifier.predict',
+                            'params': {**params, 'prevent_underflow': prevent_underflow},
+                            **time_call(lambda: classifier.predict(emails[split:], prevent_underflow), repeat)})
+    return results
+
+
+def bench_cleaning(corpora: Sequence[Tuple[int, int]], repeat: int = 3, seed: int = 0, processes: int = 1) -> List[dict]:
+    """
+    Time clean_emails on the raw texts of synthetic corpora.
+    """
+    results = []
+    for n_emails, vocabulary_size in corpora:
+        emails, _ = synthetic_corpus(n_emails, vocabulary_size, seed=seed)
+        params = {'emails': n_emails, 'vocabulary': vocabulary_size, 'processes': processes}
+        results.append({'name': 'clean_emails', 'params': params,
+                        **time_call(lambda: clean_emails(emails, processes), repeat)})
+    return results
+
+
+def run(quick: bool = False, repeat: int = 3, seed: int = 0, processes: int = 1) -> dict:
+    """
+    Run all benchmarks and return the results, with a description of the environment.
+
+    Args:
+        - quick (bool, optional): If True, run only the smallest cases. Defaults to False.
+        - repeat (int, optional): Number of timed calls per case. Defaults to 3.
+        - seed (int, optional): Seed of the synthetic inputs. Defaults to 0.
+        - processes (int, optional): Worker processes for clean_emails. Defaults to 1.
+
+    Returns:
+        - dict: {'environment': {...}, 'results': [{'name', 'params', 'min', 'median', 'repeat'}, ...]}
+    """
+    networks = QUICK_NETWORKS if quick else NETWORKS
+    corpora = QUICK_CORPORA if quick else CORPORA
+    results = (bench_inference(networks, repeat, seed)
+               + bench_naive_bayes(corpora, repeat, seed)
+               + bench_cleaning(corpora, repeat, seed, processes))
+    environment = {'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                   'python': platform.python_version(), 'numpy': np.__version__,
+                   'platform': platform.platform(), 'cpus': os.cpu_count(), 'seed': seed, 'quick': quick}
+    return {'environment': environment, 'results': results}
+
+
+def _key(result: dict) -> str:
+    return result['name'] + json.dumps(result['params'], sort_keys=True)
+
+
+def compare(current: dict, baseline: dict, tolerance: float = 0.2) -> List[dict]:
+    """
+    Return the cases whose minimum time grew by more than `tolerance` (as a fraction) from the
+    baseline results. Cases missing from either run are skipped.
+    """
+    before = {_key(result): result for result in baseline['results']}
+    slower = []
+    for result in current['results']:
+        old = before.get(_key(result))
+        if old is not None and result['min'] > old['min'] * (1 + tolerance):
+            slower.append({'name': result['name'], 'params': result['params'],
+                           'before': old['min'], 'after': result['min'], 'ratio': result['min'] / old['min']})
+    return slower
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the inference and spam classification code on synthetic data.")
+    parser.add_argument('--output', help="write the results to this JSON file")
+    parser.add_argument('--compare', help="results file of an earlier run to compare with")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="allowed slowdown before a case is reported (fraction)")
+    parser.add_argument('--quick', action='store_true', help="run only the smallest cases")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--processes', type=int, default=1, help="worker processes for clean_emails")
+    args = parser.parse_args()
+
+    results = run(args.quick, args.repeat, args.seed, args.processes)
+    for result in results['results']:
+        params = ', '.join(f'{k}={v}' for k, v in result['params'].items())
+        print(f"{result['name']:<30} {params:<60} min {result['min']:.4f}s  median {result['median']:.4f}s")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            slower = compare(results, json.load(f), args.tolerance)
+        for case in slower:
+            print(f"SLOWER: {case['name']} {case['params']}: {case['before']:.4f}s -> {case['after']:.4f}s (x{case['ratio']:.2f})")
+        if slower:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+## Synthetic data for benchmarks
+
+This module generates reproducible inputs for the benchmarks, so that they run offline and
+their size can be scaled independently of the Enron dataset.
+
+Functions:
+- random_bayes_net: Returns a random BayesNet with a given number of nodes and maximum in-degree.
+- random_evidence: Returns a random evidence assignment covering a fraction of a net's variables.
+- synthetic_corpus: Returns raw spam/ham email texts drawn from two word distributions.
+
+University: University of Peloponnese, Department of Informatics and Telecommunications
+
+Course: Artificial Intelligence
+
+Authors:
+- Giannopoulos Georgios
+- Giannopoulos Ioannis
+"""
+from itertools import product
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from bayes_networks.bayes_net import BayesNet
+
+def random_bayes_net(n_nodes: int, max_parents: int = 3, seed: Optional[int] = None) -> BayesNet:
+    """
+    Build a random BayesNet of boolean variables V0, V1, ... in topological order. Each variable
+    gets between 0 and max_parents parents chosen uniformly among the earlier variables, and every
+    row of its CPT a probability drawn uniformly from (0.05, 0.95).
+
+    Args:
+        - n_nodes (int): The number of variables.
+        - max_parents (int, optional): The largest in-degree. Defaults to 3.
+        - seed (int, optional): Seed of the random generator.
+
+    Returns:
+        - BayesNet: The random network.
+    """
+    rng = np.random.default_rng(seed)
+    node_specs = []
+    for i in range(n_nodes):
+        k = int(rng.integers(0, min(i, max_parents) + 1))
+        parents = [f'V{j}' for j in sorted(rng.choice(i, size=k, replace=False).tolist())]
+        if parents:
+            cpt = {values: float(p) for values, p in
+                   zip(product([True, False], repeat=k), rng.uniform(0.05, 0.95, 2 ** k))}
+        else:
+            cpt = float(rng.uniform(0.05, 0.95))
+        node_specs.append((f'V{i}', parents, cpt))
+    return BayesNet(node_specs)
+
+
+def random_evidence(bn: BayesNet, density: float, seed: Optional[int] = None,
+                    exclude: Sequence[str] = ()) -> Dict[str, bool]:
+    """
+    Pick round(density * number of variables) of bn's variables, other than those in exclude,
+    and assign each a random value.
+
+    Args:
+        - bn (BayesNet): The network.
+        - density (float): Fraction of the variables that are observed, between 0 and 1.
+        - seed (int, optional): Seed of the random generator.
+        - exclude (sequence, optional): Variables that must not be observed, e.g. the query variable.
+
+    Returns:
+        - dict: The evidence, variable -> value.
+    """
+    rng = np.random.default_rng(seed)
+    candidates = [var for var in bn.variables if var not in exclude]
+    n = min(len(candidates), round(density * len(bn.variables)))
+    chosen = rng.choice(len(candidates), size=n, replace=False)
+    return {candidates[i]: bool(value) for i, value in zip(chosen.tolist(), rng.random(n) < 0.5)}
+
+
+def synthetic_corpus(n_emails: int, vocabulary_size: int = 20000, spam_ratio: float = 0.3,
+                     mean_length: int = 200, seed: Optional[int] = None) -> Tuple[List[str], List[str]]:
+    """
+    Generate raw email texts and their labels. Spam and ham words are drawn from two different
+    Zipf-like distributions over the same vocabulary, and the words of an email are joined with
+    spaces, punctuation and line breaks so that cleaning has some work to do.
+
+    Args:
+        - n_emails (int): The number of emails.
+        - vocabulary_size (int, optional): The number of distinct words. Defaults to 20000.
+        - spam_ratio (float, optional): The expected fraction of spam emails. Defaults to 0.3.
+        - mean_length (int, optional): The mean number of words per email. Defaults to 200.
+        - seed (int, optional): Seed of the random generator.
+
+    Returns:
+        - emails (list): The email texts.
+        - labels (list): The labels, 'spam' or 'ham'.
+    """
+    rng = np.random.default_rng(seed)
+    words = np.array([f'w{i}' for i in range(vocabulary_size)])
+    ranks = 1 / np.arange(1, vocabulary_size + 1)
+    cdf = {'ham': np.cumsum(ranks), 'spam': np.cumsum(rng.permutation(ranks))}
+    separators = np.array([' ', ' ', ' ', ', ', '. ', '!\n', '?\n', ' - '])
+    labels = np.where(rng.random(n_emails) < spam_ratio, 'spam', 'ham').tolist()
+    emails = []
+    for label, length in zip(labels, rng.poisson(mean_length, n_emails) + 1):
+        draws = rng.random(length) * cdf[label][-1]
+        tokens = words[np.minimum(np.searchsorted(cdf[label], draws, side='right'), vocabulary_size - 1)]
+        gaps = separators[rng.integers(0, len(separators), size=length)]
+        emails.append(''.join(np.char.add(tokens, gaps).tolist()))
+    return emails, labels
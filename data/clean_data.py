@@ -1,12 +1,27 @@
 """
 This module contains functions to clean the data.
 """
-import re
-from typing import List
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from string import ascii_letters, digits
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+TOKENIZER_VERSION = 1
+"""Version of the output of clean_str; increase it whenever a change gives different words, so that cached corpora are rebuilt"""
+
+_SEPARATORS = bytes(c if chr(c) in ascii_letters + digits + '!?' else ord(' ') for c in range(256))
+"""Byte translation table keeping ASCII letters, digits, '!' and '?' and turning every other byte into a space"""
 
 def clean_str(string: str) -> set:
     """
     Cleans the input string by removing special characters, punctuation, and extra spaces.
+
+    The string is tokenized with one table-driven pass over its UTF-8 bytes: every character
+    other than ASCII letters, digits, '!' and '?' (non-ASCII characters included) separates
+    words, '!' and '?' are words of their own, and words are lowercased. For compatibility
+    with models trained on earlier versions of this function, '?' is kept as the
+    two-character token '\\?' (backslash, question mark).
     
     Args:
         string (str): The input string to be cleaned.
@@ -14,30 +29,60 @@ def clean_str(string: str) -> set:
     Returns:
         set: A set of cleaned words from the input string.
     """
-    string = re.sub(r"[^A-Za-z0-9!?]", " ", string)
-    string = re.sub(r"\'s", " \'s", string)
-    string = re.sub(r"\'ve", " \'ve", string)
-    string = re.sub(r"n\'t", " n\'t", string)
-    string = re.sub(r"\'re", " \'re", string)
-    string = re.sub(r"\'d", " \'d", string)
-    string = re.sub(r"\'ll", " \'ll", string)
-    string = re.sub(r",", " , ", string)
-    string = re.sub(r"!", " ! ", string)
-    string = re.sub(r"\(", " \( ", string)
-    string = re.sub(r"\)", " \) ", string)
-    string = re.sub(r"\?", " \? ", string)
-    string = re.sub(r"\s{2,}", " ", string)
-    return set(string.strip().lower().split())
-
-def clean_emails(emails: List[str]) -> List[str]:
+    cleaned = string.encode('utf-8', errors='surrogatepass').translate(_SEPARATORS)
+    cleaned = cleaned.replace(b'!', b' ! ').replace(b'?', b' \\? ')
+    return set(cleaned.decode('ascii').lower().split())
+
+def clean_emails(emails: List[str], processes: Optional[int] = 1, chunk_size=256) -> List[str]:
     """
     Cleans a list of emails by applying the clean_str function to each email.
 
+    With more than one process, the emails are sent to a pool of worker processes in chunks
+    of `chunk_size` emails, and the results come back in the original order.
+
     Args:
         emails (list): A list of email strings.
+        processes (int, optional): Number of worker processes. None uses all CPU cores. Defaults to 1 (no pool).
+        chunk_size (int, optional): Number of emails sent to a worker at a time. Defaults to 256.
 
     Returns:
         list: A list of cleaned email strings.
     """
-    return [clean_str(email) for email in emails]
+    processes = processes or os.cpu_count() or 1
+    if processes == 1 or len(emails) <= chunk_size:
+        return [clean_str(email) for email in emails]
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        return list(pool.map(clean_str, emails, chunksize=chunk_size))
+
+
+def iter_clean_emails(records: Iterable[Tuple[str, str]], processes: Optional[int] = 1,
+                      batch_size=4096, chunk_size=256) -> Iterator[Tuple[set, str]]:
+    """
+    Cleans a stream of (email, label) records, in their original order.
+
+    With one process every email is cleaned as it arrives. With more, the stream is read in
+    batches of `batch_size` records, and each batch is cleaned by a pool of worker processes
+    in chunks of `chunk_size` emails, so at most one batch is held in memory at a time.
 
+    Args:
+        records (iterable): (email string, label) pairs, e.g. from iter_dataset.
+        processes (int, optional): Number of worker processes. None uses all CPU cores. Defaults to 1 (no pool).
+        batch_size (int, optional): Number of records read at a time when using a pool. Defaults to 4096.
+        chunk_size (int, optional): Number of emails sent to a worker at a time. Defaults to 256.
+
+    Yields:
+        tuple: The set of cleaned words of each email and its label.
+    """
+    processes = processes or os.cpu_count() or 1
+    if processes == 1:
+        for email, label in records:
+            yield clean_str(email), label
+        return
+    records = iter(records)
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        while True:
+            batch = list(islice(records, batch_size))
+            if not batch:
+                return
+            emails, labels = zip(*batch)
+            yield from zip(pool.map(clean_str, emails, chunksize=chunk_size), labels)
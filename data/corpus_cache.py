@@ -0,0 +1,164 @@
+"""
+Module to cache the cleaned, tokenized email dataset on disk.
+
+A cache entry is a directory named after the SHA-256 of the archive and the tokenizer version
+(data.clean_data.TOKENIZER_VERSION), holding:
+- tokens.npy: the word ids of all emails, one email after the other (int32)
+- offsets.npy: the emails' start positions in tokens, plus the total length (int64)
+- labels.npy: 1 for spam and 0 for ham (uint8)
+- vocabulary.txt: the words, one per line; word id i is line i
+
+Later runs with the same archive memory-map the arrays instead of extracting and cleaning the
+archive again. A change to the archive or to the tokenizer selects a different entry.
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+from array import array
+from typing import List, Optional, Tuple
+import numpy as np
+from data.clean_data import TOKENIZER_VERSION, iter_clean_emails
+from data.download_data import download_dataset, iter_dataset
+from instrumentation import metrics
+
+LABEL_NAMES = ('ham', 'spam')
+"""Label of each value of labels.npy"""
+
+def file_sha256(filename: str, chunk_size=1 << 20) -> str:
+    """
+    Return the SHA-256 hex digest of a file, read in chunks of chunk_size bytes.
+    """
+    digest = hashlib.sha256()
+    with open(filename, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def cache_path(tar_filename: str, cache_dir: str) -> str:
+    """
+    Return the directory of the cache entry of an archive for the current tokenizer version.
+    """
+    return os.path.join(cache_dir, f"{file_sha256(tar_filename)}-tokenizer{TOKENIZER_VERSION}")
+
+class TokenizedCorpus:
+    """
+    A cleaned email dataset stored as flat token id arrays (see the module docstring).
+    """
+
+    def __init__(self, tokens: np.ndarray, offsets: np.ndarray, labels: np.ndarray, vocabulary: List[str]):
+        self.tokens = tokens
+        """Word ids of all emails, concatenated"""
+        self.offsets = offsets
+        """Email i is tokens[offsets[i]:offsets[i + 1]]"""
+        self.labels = labels
+        """1 for spam, 0 for ham"""
+        self.vocabulary = vocabulary
+        """Word of every id"""
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def email(self, i: int) -> set:
+        """Return the set of words of email i."""
+        return {self.vocabulary[t] for t in self.tokens[self.offsets[i]:self.offsets[i + 1]].tolist()}
+
+    def emails(self) -> List[set]:
+        """Return the sets of words of all emails, as returned by clean_emails."""
+        words = np.array(self.vocabulary, dtype=object)[self.tokens].tolist()
+        offsets = self.offsets.tolist()
+        return [set(words[start:end]) for start, end in zip(offsets, offsets[1:])]
+
+    def label_names(self) -> List[str]:
+        """Return the labels as 'ham' and 'spam' strings."""
+        return np.array(LABEL_NAMES)[self.labels].tolist()
+
+    def __repr__(self) -> str:
+        return f"TokenizedCorpus(emails={len(self)}, tokens={len(self.tokens)}, words={len(self.vocabulary)})"
+
+def build_cache(tar_filename: str, path: str, processes: Optional[int] = 1):
+    """
+    Stream the dataset in a tar file through cleaning (see iter_dataset and iter_clean_emails)
+    and write it as a cache entry to directory path. Only the token ids of the emails are kept
+    in memory, not the emails or their sets of words. The entry is written to a temporary
+    directory first and then renamed, so an interrupted run never leaves a partial entry behind.
+
+    Parameters:
+    - tar_filename (str): The name of the tar file.
+    - path (str): The directory of the cache entry.
+    - processes (int, optional): Number of worker processes cleaning the emails (see iter_clean_emails). Defaults to 1.
+    """
+    ids = {}
+    tokens = array('i')
+    lengths = []
+    labels = []
+    with metrics.timed('extract_clean'):
+        for words, label in iter_clean_emails(iter_dataset(tar_filename), processes):
+            tokens.extend(ids.setdefault(word, len(ids)) for word in words)
+            lengths.append(len(words))
+            labels.append(LABEL_NAMES.index(label))
+
+    # renumber the words in sorted order, and sort the word ids of every email
+    vocabulary = sorted(ids)
+    rank = np.empty(len(ids), dtype=np.int32)
+    rank[np.fromiter((ids[word] for word in vocabulary), dtype=np.int64, count=len(ids))] = np.arange(len(ids), dtype=np.int32)
+    tokens = rank[np.frombuffer(tokens, dtype=np.int32)] if len(tokens) else np.zeros(0, dtype=np.int32)
+    tokens = tokens[np.lexsort((tokens, np.repeat(np.arange(len(lengths)), lengths)))]
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    labels = np.array(labels, dtype=np.uint8)
+
+    parent = os.path.dirname(os.path.abspath(path))
+    os.makedirs(parent, exist_ok=True)
+    tmp = tempfile.mkdtemp(dir=parent)
+    try:
+        np.save(os.path.join(tmp, 'tokens.npy'), tokens)
+        np.save(os.path.join(tmp, 'offsets.npy'), offsets)
+        np.save(os.path.join(tmp, 'labels.npy'), labels)
+        with open(os.path.join(tmp, 'vocabulary.txt'), 'w', encoding='utf-8') as f:
+            f.write('\n'.join(vocabulary))
+        os.replace(tmp, path)
+    except OSError:
+        shutil.rmtree(tmp, ignore_errors=True)
+        if not os.path.isdir(path):  # another process may have written the same entry first
+            raise
+
+def load_cache(path: str, mmap=True) -> TokenizedCorpus:
+    """
+    Load a cache entry, memory-mapping its arrays if mmap is True.
+    """
+    mmap_mode = 'r' if mmap else None
+    with open(os.path.join(path, 'vocabulary.txt'), encoding='utf-8') as f:
+        vocabulary = f.read().split('\n')
+    if vocabulary == ['']:
+        vocabulary = []
+    return TokenizedCorpus(np.load(os.path.join(path, 'tokens.npy'), mmap_mode=mmap_mode),
+                           np.load(os.path.join(path, 'offsets.npy'), mmap_mode=mmap_mode),
+                           np.load(os.path.join(path, 'labels.npy'), mmap_mode=mmap_mode),
+                           vocabulary)
+
+def cached_dataset(url: str, filename: str, cache_dir='.dataset_cache', processes: Optional[int] = 1) -> Tuple[List[set], List[str]]:
+    """
+    Return the cleaned emails and labels of the dataset in archive filename, from the cache if
+    possible. The archive is downloaded from url only if filename does not exist, so a local
+    archive works without network access; the cache entry is built on the first run.
+
+    Parameters:
+    - url (str): The URL of the dataset, used only if filename is missing.
+    - filename (str): The name of the tar file.
+    - cache_dir (str, optional): The directory holding the cache entries. Defaults to '.dataset_cache'.
+    - processes (int, optional): Number of worker processes cleaning the emails when the entry is built. Defaults to 1.
+
+    Returns:
+    - emails (list): The cleaned emails, each a set of words.
+    - y (list): The labels, each either 'ham' or 'spam'.
+    """
+    if not os.path.exists(filename):
+        with metrics.timed('download'):
+            download_dataset(url, filename)
+    path = cache_path(filename, cache_dir)
+    if not os.path.isdir(path):
+        build_cache(filename, path, processes)
+    with metrics.timed('load_cache'):
+        corpus = load_cache(path)
+        return corpus.emails(), corpus.label_names()
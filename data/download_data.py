@@ -3,20 +3,61 @@ Module to download and extract email dataset.
 
 This module contains functions to download a dataset from a given URL and extract the dataset from a tar file.
 The dataset is expected to be a collection of emails, each of which is labeled as either 'ham' or 'spam'.
-The emails and their corresponding labels are returned as two separate lists.
+The emails and their corresponding labels are returned as two separate lists,
+or streamed one (email, label) pair at a time.
 """
+import os
+import posixpath
+import tempfile
 import urllib.request
 import tarfile
+from typing import Iterator, Tuple
 
 def download_dataset(url: str, filename: str):
     """
     This function downloads a dataset from the given URL and saves it to a file with the given filename.
+    The archive is downloaded to a temporary file next to filename, read through once to check that
+    it is complete, and only then moved into place, so an interrupted download never leaves a
+    truncated archive under filename.
 
     Args:
     - url (str): The URL of the dataset to download.
     - filename (str): The name of the file to save the downloaded dataset to.
     """
-    urllib.request.urlretrieve(url, filename)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(filename)), suffix='.part')
+    os.close(fd)
+    try:
+        urllib.request.urlretrieve(url, tmp)
+        with tarfile.open(tmp, "r|gz") as tar:
+            for _ in tar:
+                pass
+        os.replace(tmp, filename)
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+def iter_dataset(tar_filename: str) -> Iterator[Tuple[str, str]]:
+    """
+    This function streams a dataset out of a tar file, one email at a time.
+    The archive is read sequentially, so the first emails are available before the whole
+    archive is decompressed and only one email is held in memory at a time.
+    An email is labeled by the directory it is in, which must be 'ham' or 'spam'
+    (for example 'enron1/ham/0001.txt'); other files are skipped.
+
+    Parameters:
+    - tar_filename (str): The name of the tar file to extract the dataset from.
+
+    Yields:
+    - (email, label) (tuple): The email as a string and its label, either 'ham' or 'spam'.
+    """
+    with tarfile.open(tar_filename, "r|gz") as tar:
+        for member in tar:
+            label = posixpath.basename(posixpath.dirname(member.name))
+            if label not in ('ham', 'spam'):
+                continue
+            f = tar.extractfile(member)
+            if f is not None:
+                yield f.read().decode('utf-8', errors='ignore'), label
 
 def extract_dataset(tar_filename: str):
     """
@@ -33,16 +74,7 @@ def extract_dataset(tar_filename: str):
     """
     emails = []
     y = []
-    with tarfile.open(tar_filename, "r:gz") as tar:
-        for member in tar.getmembers():
-            f = tar.extractfile(member)
-            if f is not None:
-                content = f.read()
-                if 'enron1/ham' in member.name:
-                    emails.append(content.decode('utf-8', errors='ignore'))
-                    y.append('ham')
-                elif 'enron1/spam' in member.name:
-                    emails.append(content.decode('utf-8', errors='ignore'))
-                    y.append('spam')
+    for email, label in iter_dataset(tar_filename):
+        emails.append(email)
+        y.append(label)
     return emails, y
-
@@ -1,7 +1,9 @@
 """Module to split the given emails and labels into training and testing sets."""
 
 import numpy as np
-from typing import List
+from typing import Iterable, Iterator, List, TypeVar
+
+T = TypeVar('T')
 
 def split_data(emails: List, y: List, train_ratio=0.8, seed=13):
     """
@@ -21,12 +23,70 @@ def split_data(emails: List, y: List, train_ratio=0.8, seed=13):
     """
     np.random.seed(seed)
     N = len(emails)
-    idx = np.random.permutation(N)
+    idx = np.random.permutation(N).tolist()
+    n_train = int(train_ratio * N)
     
-    emails_train = [emails[idx[i]] for i in range(int(0.8*N))]
-    y_train = [y[idx[i]] for i in range(int(0.8*N))]
+    emails_train = [emails[i] for i in idx[:n_train]]
+    y_train = [y[i] for i in idx[:n_train]]
 
-    emails_test = [emails[idx[i]] for i in range(int(0.8*N), N)]
-    y_test = [y[idx[i]] for i in range(int(0.8*N), N)]
+    emails_test = [emails[i] for i in idx[n_train:]]
+    y_test = [y[i] for i in idx[n_train:]]
     
     return emails_train, y_train, emails_test, y_test
+
+def k_fold_indices(y: List, k=5, stratified=False, seed=13) -> List[np.ndarray]:
+    """
+    Split the positions of the given labels into k random folds of (almost) equal size, for
+    k-fold cross-validation.
+
+    Parameters:
+    - y (list): List of labels, one per email.
+    - k (int, optional): Number of folds. Defaults to 5.
+    - stratified (bool, optional): If True, every label is spread evenly over the folds, so each fold has about the same label proportions as y. Defaults to False.
+    - seed (int, optional): Seed value for random number generation. Defaults to 13.
+
+    Returns:
+    - folds (list): k sorted arrays of positions in y; every position is in exactly one fold.
+    """
+    assert 2 <= k <= len(y), "k must be between 2 and the number of emails"
+    rng = np.random.default_rng(seed)
+    if not stratified:
+        return [np.sort(fold) for fold in np.array_split(rng.permutation(len(y)), k)]
+    y = np.asarray(y)
+    parts = [[] for _ in range(k)]
+    offset = 0
+    for label in np.unique(y):
+        members = rng.permutation(np.flatnonzero(y == label))
+        # deal the members out in turn, continuing from the fold where the previous label stopped,
+        # so that fold sizes differ by at most one
+        for i in range(k):
+            parts[(offset + i) % k].append(members[i::k])
+        offset = (offset + len(members)) % k
+    return [np.sort(np.concatenate(part)) for part in parts]
+
+def iter_split(records: Iterable[T], train: bool = True, train_ratio=0.8, seed=13, block_size=4096) -> Iterator[T]:
+    """
+    Stream the training (or testing) side of a random split of the given records.
+
+    Each record goes to the training set with probability `train_ratio`, decided by a random
+    number drawn for its position in the stream. The draws depend only on `seed` and `block_size`, so two passes
+    over the same stream, one with `train=True` and one with `train=False`, give complementary
+    sets without holding the stream in memory.
+
+    Parameters:
+    - records (iterable): Stream of records, e.g. (words, label) pairs.
+    - train (bool, optional): Yield the training records if True, the testing records otherwise. Defaults to True.
+    - train_ratio (float, optional): Probability of a record being used for training. Defaults to 0.8.
+    - seed (int, optional): Seed value for random number generation. Defaults to 13.
+    - block_size (int, optional): Number of random draws made at a time. Defaults to 4096.
+
+    Yields:
+    - The records of the requested side of the split, in stream order.
+    """
+    rng = np.random.default_rng(seed)
+    draws = rng.random(block_size)
+    for i, record in enumerate(records):
+        if i % block_size == 0 and i > 0:
+            draws = rng.random(block_size)
+        if (draws[i % block_size] < train_ratio) == train:
+            yield record
@@ -0,0 +1,127 @@
+"""
+## Metrics
+
+This module is an opt-in instrumentation layer: instrumented code reports named counters and
+timers, which are recorded only while a collector is active. When none is, instrumented code
+only checks `metrics.active is None`, so the overhead is a global lookup and a comparison.
+
+Collection is enabled with the `collect` context manager, which yields the Metrics being
+filled and can pass them to a callback when it exits (e.g. to forward them to a metrics system):
+
+    with collect() as m:
+        enumeration_ask('Apati', {}, bayes_net)
+    print(m.counters['enumerate_all.calls'], m.timers['enumeration_ask'])
+
+Instrumented code either calls `count` and `timed`, or, in hot loops, checks `active` itself
+and counts on it directly. The active collector is process-wide (not per thread).
+
+Classes:
+- Metrics: Named counters and timers.
+
+Functions:
+- collect: Context manager that records metrics while it is active.
+- count: Adds to a counter of the active collector, if any.
+- timed: Context manager that adds its duration to a timer of the active collector, if any.
+
+University: University of Peloponnese, Department of Informatics and Telecommunications
+
+Course: Artificial Intelligence
+
+Authors:
+- Giannopoulos Georgios
+- Giannopoulos Ioannis
+"""
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+
+class Metrics():
+    """
+    Named counters, and timers that accumulate the total time and number of timed calls.
+    """
+
+    def __init__(self) -> None:
+        self.counters: Dict[str, int] = defaultdict(int)
+        """Value of every counter"""
+        self.timers: Dict[str, float] = defaultdict(float)
+        """Total time in seconds of every timer"""
+        self.timer_calls: Dict[str, int] = defaultdict(int)
+        """Number of timed calls of every timer"""
+
+    def count(self, name: str, n: int = 1):
+        self.counters[name] += n
+
+    def add_time(self, name: str, seconds: float):
+        self.timers[name] += seconds
+        self.timer_calls[name] += 1
+
+    def merge(self, other: 'Metrics'):
+        """Add the counters and timers of other to these."""
+        for name, n in other.counters.items():
+            self.counters[name] += n
+        for name, seconds in other.timers.items():
+            self.timers[name] += seconds
+            self.timer_calls[name] += other.timer_calls[name]
+
+    def as_dict(self) -> dict:
+        """Return the metrics as a JSON-serializable dict."""
+        return {'counters': dict(self.counters),
+                'timers': {name: {'seconds': seconds, 'calls': self.timer_calls[name]}
+                           for name, seconds in self.timers.items()}}
+
+    def report(self) -> str:
+        """Return the metrics as lines of text, timers first."""
+        lines: List[str] = [f"{name}: {seconds:.4f}s ({self.timer_calls[name]} calls)" for name, seconds in self.timers.items()]
+        lines += [f"{name}: {n}" for name, n in self.counters.items()]
+        return '\n'.join(lines)
+
+    def __repr__(self) -> str:
+        return f"Metrics(counters={dict(self.counters)}, timers={dict(self.timers)})"
+
+
+active: Optional[Metrics] = None
+"""The collector that instrumented code reports to, None when instrumentation is off"""
+
+@contextmanager
+def collect(callback: Optional[Callable[[Metrics], None]] = None) -> Iterator[Metrics]:
+    """
+    Record the metrics reported while the with block runs and yield them.
+
+    Collectors can be nested: the inner one records what happens inside it, and on exit its
+    metrics are also added to the outer one.
+
+    Args:
+        - callback (callable, optional): Called with the Metrics when the block exits.
+    """
+    global active
+    outer, metrics = active, Metrics()
+    active = metrics
+    try:
+        yield metrics
+    finally:
+        active = outer
+        if outer is not None:
+            outer.merge(metrics)
+        if callback is not None:
+            callback(metrics)
+
+
+def count(name: str, n: int = 1):
+    """Add n to counter name of the active collector, if any."""
+    if active is not None:
+        active.count(name, n)
+
+
+@contextmanager
+def timed(name: str) -> Iterator[None]:
+    """Add the time spent in the with block to timer name of the active collector, if any."""
+    metrics = active
+    if metrics is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.add_time(name, time.perf_counter() - start)
@@ -11,14 +11,15 @@ Authors:
 
 Project Description: Implementation of Naive Bayes Classifier for the classification of the spam emails. 
 """
+import sys
 from probability_distribution.probdist import ProbDist
 from bayes_networks.bayes_node import BayesNode
 from bayes_networks.bayes_net import BayesNet
 from bayes_networks.bayes_network_utils import extend, enumerate_all, enumeration_ask
-from data.download_data import download_dataset, extract_dataset
-from data.clean_data import clean_emails
+from data.corpus_cache import cached_dataset
 from data.split_data import split_data
 from naive_bayes.naive_bayes_classifier import NaiveBayesClassifier
+from instrumentation import metrics
 
 def main() -> None:
     print("\t\t2η Εργασία Τεχνητής Νοημοσύνης")
@@ -56,39 +57,43 @@ def main() -> None:
 #                                   Naive Bayes Classifier for spam detection
 # ==========================================================================================================================================
     print("\n\t\tNaive Bayes Classifier for spam detection\n")
-    # Download and extract dataset
+    # Download (unless the archive is already here), extract and clean the dataset,
+    # or load it from the tokenized cache of an earlier run
     url = "http://nlp.cs.aueb.gr/software_and_datasets/Enron-Spam/preprocessed/enron1.tar.gz"
     filename = "enron1.tar.gz"
-    download_dataset(url, filename)
-    emails, y = extract_dataset(filename)
-
-    # Clean dataset
-    cleaned_emails = clean_emails(emails)
+    cleaned_emails, y = cached_dataset(url, filename)
 
     # Split dataset
-    emails_train, y_train, emails_test, y_test = split_data(cleaned_emails, y)
+    with metrics.timed('split'):
+        emails_train, y_train, emails_test, y_test = split_data(cleaned_emails, y)
 
     print('Emails in training set:', len(emails_train))
     print('Emails in test set:', len(emails_test))
 
     # Train Naive Bayes Classifier
     nb_classifier = NaiveBayesClassifier()
-    nb_classifier.train(emails_train, y_train)
+    with metrics.timed('train'):
+        nb_classifier.train(emails_train, y_train)
 
     # Predict on the test set
-    y_pred = nb_classifier.predict(emails_test)
+    with metrics.timed('predict'):
+        y_pred = nb_classifier.predict(emails_test)
 
     # Calculate accuracy
     accuracy = nb_classifier.accuracy(y_test, y_pred)
     print(f"Accuracy without Laplace Smoothing and underflow prevention: {round(accuracy, 3)}")
     # train with Laplace Smoothing set to True
-    nb_classifier.train(emails_train, y_train, laplace_smoothing=True)
-    y_pred = nb_classifier.predict(emails_test, prevent_underflow=False)
+    with metrics.timed('train'):
+        nb_classifier.train(emails_train, y_train, laplace_smoothing=True)
+    with metrics.timed('predict'):
+        y_pred = nb_classifier.predict(emails_test, prevent_underflow=False)
     accuracy = nb_classifier.accuracy(y_test, y_pred)
     print(f"Accuracy with Laplace Smoothing set True and prevent underflow to False: {round(accuracy, 3)}")
     # train with Laplace Smoothing set to True and prevent underflow set to True
-    nb_classifier.train(emails_train, y_train, laplace_smoothing=True)
-    y_pred = nb_classifier.predict(emails_test, prevent_underflow=True)
+    with metrics.timed('train'):
+        nb_classifier.train(emails_train, y_train, laplace_smoothing=True)
+    with metrics.timed('predict'):
+        y_pred = nb_classifier.predict(emails_test, prevent_underflow=True)
     accuracy = nb_classifier.accuracy(y_test, y_pred)
     print(f"Accuracy with Laplace Smoothing set True and prevent underflow to True: {round(accuracy, 3)}")
 
@@ -129,4 +134,9 @@ def main() -> None:
     
     print(nb_classifier)
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    # pass --metrics to print the stage timings and inference counters at the end
+    if '--metrics' in sys.argv[1:]:
+        with metrics.collect(lambda m: print("\n" + m.report())):
+            main()
+    else:
+        main()
\ No newline at end of file
@@ -0,0 +1,136 @@
+"""
+## Evaluation
+
+This module evaluates the Naive Bayes Classifier: classification metrics computed with NumPy
+over whole label arrays, and k-fold cross-validation that counts the words of every fold once.
+The training counts of each fold are the totals minus the counts of the held-out fold, which
+gives exactly the model that training on the other k - 1 folds would, without recounting them.
+
+Functions:
+- confusion_matrix: Returns the confusion matrix of true and predicted labels.
+- classification_metrics: Returns the accuracy, precision, recall, F1 score and confusion matrix.
+- cross_validate: Runs (stratified) k-fold cross-validation, evaluating the folds in parallel.
+
+University: University of Peloponnese, Department of Informatics and Telecommunications
+
+Course: Artificial Intelligence
+
+Authors:
+- Giannopoulos Georgios
+- Giannopoulos Ioannis
+"""
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from typing import List, Optional, Sequence, Tuple
+import numpy as np
+from data.split_data import k_fold_indices
+from naive_bayes.naive_bayes_classifier import NaiveBayesClassifier, _count_words
+
+LABELS = ('ham', 'spam')
+"""Row and column order of confusion matrices"""
+
+def confusion_matrix(y_true: Sequence[str], y_pred: Sequence[str], labels: Sequence[str] = LABELS) -> np.ndarray:
+    """
+    Return the confusion matrix: entry [i, j] is the number of emails with true label labels[i]
+    that were predicted as labels[j].
+
+    Args:
+        - y_true (list): The true labels.
+        - y_pred (list): The predicted labels.
+        - labels (sequence, optional): The labels, in row and column order. Defaults to ('ham', 'spam').
+
+    Returns:
+        - np.ndarray: Integer array of shape (len(labels), len(labels)).
+    """
+    labels = np.asarray(labels)
+    true = np.asarray(y_true)[:, None] == labels
+    pred = np.asarray(y_pred)[:, None] == labels
+    return true.T.astype(np.int64) @ pred.astype(np.int64)
+
+
+def classification_metrics(y_true: Sequence[str], y_pred: Sequence[str], positive: str = 'spam') -> dict:
+    """
+    Compute the accuracy and, for the positive label, the precision, recall and F1 score.
+    A ratio whose denominator is 0 is reported as 0.
+
+    Args:
+        - y_true (list): The true labels.
+        - y_pred (list): The predicted labels.
+        - positive (str, optional): The label counted as positive. Defaults to 'spam'.
+
+    Returns:
+        - dict: 'accuracy', 'precision', 'recall', 'f1' and 'confusion' (a nested list, see confusion_matrix).
+    """
+    y_true, y_pred = np.asarray(y_true), np.asarray(y_pred)
+    tp = int(np.count_nonzero((y_true == positive) & (y_pred == positive)))
+    predicted = int(np.count_nonzero(y_pred == positive))
+    actual = int(np.count_nonzero(y_true == positive))
+    precision = tp / predicted if predicted else 0.0
+    recall = tp / actual if actual else 0.0
+    return {'accuracy': float(np.mean(y_true == y_pred)) if len(y_true) else 0.0,
+            'precision': precision,
+            'recall': recall,
+            'f1': 2 * precision * recall / (precision + recall) if precision + recall else 0.0,
+            'confusion': confusion_matrix(y_true, y_pred).tolist()}
+
+
+def _subtract_counts(total: Tuple[int, int, int, Counter, Counter], fold: Tuple[int, int, int, Counter, Counter]):
+    """Counts of all emails minus the counts of one fold (words left with no count are dropped)."""
+    return (total[0] - fold[0], total[1] - fold[1], total[2] - fold[2], total[3] - fold[3], total[4] - fold[4])
+
+
+def _evaluate_fold(counts: Tuple[int, int, int, Counter, Counter], emails: List[set], labels: List[str],
+                   laplace_smoothing: bool, prevent_underflow: bool) -> dict:
+    """Build a classifier from training counts and return its metrics on the held-out emails."""
+    classifier = NaiveBayesClassifier()
+    classifier.laplace_smoothing = laplace_smoothing
+    classifier._merge_counts(*counts)
+    return classification_metrics(labels, classifier.predict(emails, prevent_underflow))
+
+
+def cross_validate(emails: List[set], labels: List[str], k: int = 5, stratified: bool = False,
+                   laplace_smoothing: bool = True, prevent_underflow: bool = True,
+                   processes: Optional[int] = 1, seed: int = 13) -> dict:
+    """
+    Estimate the performance of the classifier with k-fold cross-validation: every fold is held
+    out once while the classifier is trained on the other folds.
+
+    The words of every fold are counted once (in parallel with more than one process), and the
+    training counts for each held-out fold are the totals minus that fold's counts. The folds are
+    then evaluated in worker processes.
+
+    Args:
+        - emails (list): A list of emails. Each element of the list is expected to be a set of words.
+        - labels (list): A list of corresponding labels.
+        - k (int, optional): Number of folds. Defaults to 5.
+        - stratified (bool, optional): If True, keep the label proportions of every fold close to the overall ones. Defaults to False.
+        - laplace_smoothing (bool, optional): If True, apply Laplace Smoothing. Defaults to True.
+        - prevent_underflow (bool, optional): If True, predict with log probabilities. Defaults to True.
+        - processes (int, optional): Number of worker processes. None uses all CPU cores. Defaults to 1 (no pool).
+        - seed (int, optional): Seed of the random fold assignment. Defaults to 13.
+
+    Returns:
+        - dict: 'folds', the metrics of every fold (see classification_metrics); 'mean', the mean
+          accuracy, precision, recall and F1 score over the folds; and 'confusion', the sum of the
+          confusion matrices of the folds.
+    """
+    folds = k_fold_indices(labels, k, stratified, seed)
+    fold_emails = [[emails[i] for i in fold.tolist()] for fold in folds]
+    fold_labels = [[labels[i] for i in fold.tolist()] for fold in folds]
+    processes = min(processes or os.cpu_count() or 1, k)
+
+    with ProcessPoolExecutor(max_workers=processes) if processes > 1 else nullcontext() as pool:
+        map_ = map if pool is None else pool.map
+        counts = list(map_(_count_words, fold_emails, fold_labels))
+        total = (sum(c[0] for c in counts), sum(c[1] for c in counts), sum(c[2] for c in counts), Counter(), Counter())
+        for c in counts:
+            total[3].update(c[3])
+            total[4].update(c[4])
+        results = list(map_(_evaluate_fold, [_subtract_counts(total, c) for c in counts], fold_emails, fold_labels,
+                            [laplace_smoothing] * k, [prevent_underflow] * k))
+
+    mean = {name: float(np.mean([result[name] for result in results])) for name in ('accuracy', 'precision', 'recall', 'f1')}
+    confusion = np.sum([result['confusion'] for result in results], axis=0).tolist()
+    return {'folds': results, 'mean': mean, 'confusion': confusion}
@@ -0,0 +1,103 @@
+"""
+## Feature selection
+
+This module ranks words by how much their presence in an email tells about the email's label,
+so that a trained Naive Bayes Classifier can keep only the informative words (see
+NaiveBayesClassifier.prune_vocabulary). Scores are computed for the whole vocabulary at once
+from the 2x2 contingency table of every word: spam/ham emails with and without the word.
+
+Functions:
+- mutual_information: Returns the mutual information between word presence and label, in nats.
+- chi_square: Returns the chi-square statistic of independence of word presence and label.
+- feature_scores: Returns the scores of every word with the chosen method.
+- select_features: Returns the mask of the words in the top k or above a threshold.
+
+University: University of Peloponnese, Department of Informatics and Telecommunications
+
+Course: Artificial Intelligence
+
+Authors:
+- Giannopoulos Georgios
+- Giannopoulos Ioannis
+"""
+from typing import Optional, Tuple
+import numpy as np
+
+def _contingency(counts: np.ndarray, n_spam: int, n_ham: int) -> Tuple[np.ndarray, ...]:
+    """Return the cells n11 (spam with word), n10 (ham with word), n01 (spam without), n00 (ham without)."""
+    counts = np.asarray(counts, dtype=float)
+    n11, n10 = counts[:, 0], counts[:, 1]
+    return n11, n10, n_spam - n11, n_ham - n10
+
+
+def mutual_information(counts: np.ndarray, n_spam: int, n_ham: int) -> np.ndarray:
+    """
+    Return the mutual information between the presence of each word and the label.
+
+    Args:
+        - counts (np.ndarray): Number of spam and ham emails containing each word, of shape (V, 2).
+        - n_spam (int): Number of spam emails.
+        - n_ham (int): Number of ham emails.
+
+    Returns:
+        - np.ndarray: Array of shape (V,), in nats; 0 for words that tell nothing about the label.
+    """
+    n = n_spam + n_ham
+    cells = _contingency(counts, n_spam, n_ham)
+    with_word = cells[0] + cells[1]
+    # (cell, word total for the cell's row, label total for the cell's column)
+    margins = [(cells[0], with_word, n_spam), (cells[1], with_word, n_ham),
+               (cells[2], n - with_word, n_spam), (cells[3], n - with_word, n_ham)]
+    mi = np.zeros(len(with_word))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for cell, row, column in margins:
+            # 0 * log(0) counts as 0
+            mi += np.where(cell > 0, cell / n * np.log(n * cell / (row * column)), 0.0)
+    return np.maximum(mi, 0.0)
+
+
+def chi_square(counts: np.ndarray, n_spam: int, n_ham: int) -> np.ndarray:
+    """
+    Return the chi-square statistic of independence between the presence of each word and the
+    label (0 where it is undefined, e.g. for a word in every email).
+
+    Args:
+        - counts (np.ndarray): Number of spam and ham emails containing each word, of shape (V, 2).
+        - n_spam (int): Number of spam emails.
+        - n_ham (int): Number of ham emails.
+
+    Returns:
+        - np.ndarray: Array of shape (V,).
+    """
+    n11, n10, n01, n00 = _contingency(counts, n_spam, n_ham)
+    denominator = (n11 + n01) * (n10 + n00) * (n11 + n10) * (n01 + n00)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(denominator > 0, (n11 + n10 + n01 + n00) * (n11 * n00 - n10 * n01) ** 2 / denominator, 0.0)
+
+
+METHODS = {'mutual_information': mutual_information, 'chi_square': chi_square}
+
+def feature_scores(counts: np.ndarray, n_spam: int, n_ham: int, method: str = 'mutual_information') -> np.ndarray:
+    """
+    Return the score of every word with method, 'mutual_information' or 'chi_square'.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown feature selection method {method!r}; expected one of {list(METHODS)}")
+    return METHODS[method](counts, n_spam, n_ham)
+
+
+def select_features(scores: np.ndarray, k: Optional[int] = None, threshold: Optional[float] = None) -> np.ndarray:
+    """
+    Return a boolean mask of the words to keep: the k best scores (ties broken by position),
+    and/or the scores of at least threshold. At least one of k and threshold must be given.
+    """
+    if k is None and threshold is None:
+        raise ValueError("Give k, threshold or both")
+    keep = np.ones(len(scores), dtype=bool)
+    if threshold is not None:
+        keep &= scores >= threshold
+    if k is not None and k < keep.sum():
+        best = np.zeros(len(scores), dtype=bool)
+        best[np.argsort(-np.where(keep, scores, -np.inf), kind='stable')[:max(k, 0)]] = True
+        keep &= best
+    return keep
@@ -0,0 +1,180 @@
+"""
+## Hashed Naive Bayes Classifier
+
+This module contains a bounded-memory variant of the Naive Bayes Classifier that uses the hashing
+trick: instead of keeping a vocabulary, every word is hashed into one of a fixed number of buckets,
+and the spam and ham counts and log-probabilities are kept per bucket. The size of the model is set
+when it is created and does not grow however many distinct words it is trained on; words that share
+a bucket are treated as one word.
+
+Classes:
+- HashedNaiveBayesClassifier: Naive Bayes Classifier over a fixed number of hash buckets.
+
+The HashedNaiveBayesClassifier class has methods for:
+- initializing the classifier with a number of buckets
+- training and updating the classifier, optionally counting buckets in parallel processes
+- pruning the buckets down to the most informative ones
+- saving and loading the bucket arrays
+- predicting the labels of the given emails (inherited from NaiveBayesClassifier).
+
+University: University of Peloponnese, Department of Informatics and Telecommunications
+
+Course: Artificial Intelligence
+
+Authors:
+- Giannopoulos Georgios
+- Giannopoulos Ioannis
+"""
+from functools import partial
+from typing import Iterable, List, Optional, Tuple
+import numpy as np
+from naive_bayes.feature_selection import feature_scores, select_features
+from naive_bayes.naive_bayes_classifier import NaiveBayesClassifier, _map_shards
+from naive_bayes.sparse_features import CSRMatrix, hash_emails
+
+class HashedNaiveBayesClassifier(NaiveBayesClassifier):
+    """
+    Naive Bayes Classifier for spam detection over a fixed number of hash buckets.
+
+    The rows of `word_count_vectors` and `log_word_count_vectors` are buckets instead of words,
+    and `words`, `vocabulary` and the per-word dicts stay empty. Buckets that no training email
+    fell into are ignored by `predict`, as unknown words are.
+    """
+
+    def __init__(self, n_buckets: int = 2 ** 20) -> None:
+        """
+        Initialize the Hashed Naive Bayes Classifier.
+
+        Args:
+            - n_buckets (int, optional): The number of hash buckets. Defaults to 2^20.
+        """
+        assert n_buckets >= 1, "n_buckets must be positive"
+        super().__init__()
+        self.n_buckets = n_buckets
+        """Number of hash buckets"""
+        self.word_count_vectors = np.zeros((n_buckets, 2), dtype=np.int64)
+        """Number of spam and ham emails with a word in each bucket, as an array of shape (n_buckets, 2)"""
+        self.log_word_count_vectors = np.zeros((n_buckets, 2))
+        """Log of the (smoothed) bucket counts (only meaningful for buckets in `seen`)"""
+        self.seen = np.zeros(n_buckets, dtype=bool)
+        """Whether any training email had a word in each bucket"""
+
+    def _reset(self):
+        self.__init__(self.n_buckets)
+
+    def partial_fit(self, emails: List[str], labels: List[str], processes: Optional[int] = 1):
+        """
+        Update the trained classifier with more emails (see `NaiveBayesClassifier.partial_fit`).
+
+        Args:
+            - emails (list): A list of emails. Each element of the list is expected to be a set of words.
+            - labels (list): A list of corresponding labels. Each element of the list is expected to be a string representing a label.
+            - processes (int, optional): Number of worker processes. None uses all CPU cores. Defaults to 1 (no pool).
+        """
+        shards = _map_shards(partial(_count_buckets, n_buckets=self.n_buckets), emails, labels, processes)
+        self._merge_bucket_counts(*_add_bucket_counts(shards))
+
+    def _merge_bucket_counts(self, n_emails: int, n_spam: int, n_ham: int, counts: np.ndarray):
+        """
+        Merge the bucket counts of a batch of emails (see `_count_buckets`) into the model and
+        update the log-probabilities of the buckets they touch.
+        """
+        self.total_emails += n_emails
+        self.spam_email_count += n_spam
+        self.ham_email_count += n_ham
+        self.p_spam = self.spam_email_count / self.total_emails
+        self.p_ham = self.ham_email_count / self.total_emails
+
+        rows = np.flatnonzero(counts.any(axis=1))
+        self.word_count_vectors[rows] += counts[rows]
+        self.seen[rows] = True
+        with np.errstate(divide='ignore'):
+            self.log_word_count_vectors[rows] = np.log(self.word_count_vectors[rows] + self.alpha)
+            self.log_email_counts = np.log([self.spam_email_count + 2 * self.alpha, self.ham_email_count + 2 * self.alpha])
+        self._p_word_vectors = self._word_probabilities()
+
+    def prune_vocabulary(self, k: Optional[int] = None, threshold: Optional[float] = None, method='mutual_information') -> int:
+        """
+        Like `NaiveBayesClassifier.prune_vocabulary`, but for buckets: the pruned buckets keep
+        their counts but are marked unseen, so `predict` ignores them. Returns the number of
+        buckets pruned.
+        """
+        scores = feature_scores(self.word_count_vectors, self.spam_email_count, self.ham_email_count, method)
+        keep = select_features(np.where(self.seen, scores, -np.inf), k, threshold) & self.seen
+        removed = int(self.seen.sum() - keep.sum())
+        self.seen = keep
+        return removed
+
+    def _features(self, emails: List[set]) -> CSRMatrix:
+        return hash_emails(emails, self.n_buckets, self.seen)
+
+    def save(self, filename: str, dtype=np.float64):
+        """
+        Save the trained classifier as an uncompressed .npz file of its bucket arrays (model files
+        store a vocabulary, which a hashed model does not have).
+
+        Args:
+            - filename (str): The name of the file to write.
+            - dtype (optional): np.float32 or np.float64, the precision of the stored log-probabilities. Defaults to np.float64.
+        """
+        with open(filename, 'wb') as f:
+            np.savez(f, word_count_vectors=self.word_count_vectors, seen=self.seen,
+                     log_word_count_vectors=self.log_word_count_vectors.astype(dtype),
+                     email_counts=np.array([self.spam_email_count, self.ham_email_count]),
+                     laplace_smoothing=np.array(self.laplace_smoothing))
+
+    @classmethod
+    def load(cls, filename: str, mmap_mode=False) -> 'HashedNaiveBayesClassifier':
+        """
+        Load a classifier saved with `save`. Its arrays are read into memory; they cannot be
+        memory-mapped.
+
+        Args:
+            - filename (str): The name of the file saved by `save`.
+            - mmap_mode (bool, optional): Must be False. Defaults to False.
+        """
+        if mmap_mode:
+            raise ValueError("Hashed model files cannot be memory-mapped; load them with mmap_mode=False")
+        with np.load(filename) as f:
+            classifier = cls(len(f['seen']))
+            classifier.word_count_vectors = f['word_count_vectors']
+            classifier.seen = f['seen']
+            classifier.log_word_count_vectors = f['log_word_count_vectors'].astype(float)
+            classifier.spam_email_count, classifier.ham_email_count = f['email_counts'].tolist()
+            classifier.laplace_smoothing = bool(f['laplace_smoothing'])
+        classifier.total_emails = classifier.spam_email_count + classifier.ham_email_count
+        if classifier.total_emails:
+            classifier.p_spam = classifier.spam_email_count / classifier.total_emails
+            classifier.p_ham = classifier.ham_email_count / classifier.total_emails
+        classifier.log_email_counts = np.log([classifier.spam_email_count + 2 * classifier.alpha,
+                                              classifier.ham_email_count + 2 * classifier.alpha])
+        return classifier
+
+    def __repr__(self) -> str:
+        return f"HashedNaiveBayesClassifier(spam_email_count={self.spam_email_count}, ham_email_count={self.ham_email_count}, total_emails={self.total_emails}, n_buckets={self.n_buckets}, used_buckets={int(self.seen.sum())}, p_spam={self.p_spam}, p_ham={self.p_ham})"
+
+
+def _count_buckets(emails: List[set], labels: List[str], n_buckets: int) -> Tuple[int, int, int, np.ndarray]:
+    """
+    Count a batch of emails: the number of emails, of spam and of ham emails, and the number of
+    spam and of ham emails with a word in each bucket, as an array of shape (n_buckets, 2).
+    """
+    labels = np.asarray(labels)
+    is_spam, is_ham = labels == 'spam', labels == 'ham'
+    X = hash_emails(emails, n_buckets)
+    rows = X.row_ids()
+    counts = np.stack([np.bincount(X.indices[is_spam[rows]], minlength=n_buckets),
+                       np.bincount(X.indices[is_ham[rows]], minlength=n_buckets)], axis=1)
+    return len(emails), int(is_spam.sum()), int(is_ham.sum()), counts
+
+
+def _add_bucket_counts(shards: Iterable[Tuple[int, int, int, np.ndarray]]) -> Tuple[int, int, int, np.ndarray]:
+    """Add up the bucket counts of several batches of emails, into the array of the first one."""
+    shards = iter(shards)
+    n_emails, n_spam, n_ham, counts = next(shards)
+    for shard in shards:
+        n_emails += shard[0]
+        n_spam += shard[1]
+        n_ham += shard[2]
+        counts += shard[3]
+    return n_emails, n_spam, n_ham, counts
@@ -0,0 +1,165 @@
+"""
+## Model file
+
+This module saves a trained NaiveBayesClassifier to a compact binary file and loads it back,
+by default as read-only memory-mapped arrays. Loading only parses a small header, so startup
+takes the same few milliseconds whatever the size of the vocabulary, and worker processes that
+load the same file share one copy of its pages through the operating system's page cache.
+
+File layout (little-endian, every section aligned to 8 bytes):
+- header: magic, format version, email counts, number of words, Laplace Smoothing flag and the
+  byte width of the stored log-probabilities (4 for float32, 8 for float64)
+- length table: (encoded length, number of words) for every group of words of the same length
+- vocabulary blob: the UTF-8 encoded words, grouped by length and sorted within each group,
+  without separators or padding; a word's row is its position in the blob
+- counts: int64 array of shape (number of words, 2), spam and ham document frequencies
+- log counts: float32/float64 array of shape (number of words, 2), log(count + alpha)
+
+Functions:
+- save_model: Writes a NaiveBayesClassifier to a model file.
+- load_model: Reads a NaiveBayesClassifier from a model file.
+
+University: University of Peloponnese, Department of Informatics and Telecommunications
+
+Course: Artificial Intelligence
+
+Authors:
+- Giannopoulos Georgios
+- Giannopoulos Ioannis
+"""
+import mmap
+import struct
+from collections import defaultdict
+from collections.abc import Mapping
+from typing import Dict, Iterator
+import numpy as np
+from naive_bayes.naive_bayes_classifier import NaiveBayesClassifier
+from naive_bayes.sparse_features import MappedVocabulary
+
+MAGIC = b'NBMODEL\x00'
+FORMAT_VERSION = 1
+_HEADER = struct.Struct('<8sIIQQQQBB6x')
+_LENGTH_ENTRY = struct.Struct('<QQ')
+
+def _padding(offset: int) -> int:
+    return -offset % 8
+
+
+class CountView(Mapping):
+    """
+    Read-only word -> count mapping over one column of the count array of a memory-mapped model.
+    Like the defaultdict it stands in for, it returns 0 for unknown words.
+    """
+
+    def __init__(self, vocabulary: MappedVocabulary, counts: np.ndarray) -> None:
+        self.vocabulary = vocabulary
+        self.counts = counts
+
+    def __getitem__(self, word: str) -> int:
+        row = self.vocabulary.get(word)
+        return 0 if row is None else int(self.counts[row])
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.vocabulary)
+
+    def __len__(self) -> int:
+        return len(self.vocabulary)
+
+
+def save_model(classifier: NaiveBayesClassifier, filename: str, dtype=np.float64):
+    """
+    Save a trained classifier to a model file.
+
+    Args:
+        - classifier (NaiveBayesClassifier): The classifier to save.
+        - filename (str): The name of the file to write.
+        - dtype (optional): np.float32 or np.float64, the precision of the stored log-probabilities. Defaults to np.float64.
+    """
+    dtype = np.dtype(dtype)
+    assert dtype in (np.float32, np.float64), "dtype must be float32 or float64"
+    kept = classifier.kept
+    words = [(word.encode('utf-8'), row) for word, row in classifier.vocabulary.items() if kept is None or kept[row]]
+    assert all(encoded and b'\x00' not in encoded for encoded, _ in words), "words must be non-empty and must not contain NUL"
+    words.sort(key=lambda item: (len(item[0]), item[0]))
+    rows = np.array([row for _, row in words], dtype=np.int64)
+
+    lengths: Dict[int, int] = {}
+    for encoded, _ in words:
+        lengths[len(encoded)] = lengths.get(len(encoded), 0) + 1
+
+    with open(filename, 'wb') as f:
+        f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, len(lengths), classifier.total_emails, classifier.spam_email_count,
+                             classifier.ham_email_count, len(words), int(classifier.laplace_smoothing), dtype.itemsize))
+        for length, count in lengths.items():
+            f.write(_LENGTH_ENTRY.pack(length, count))
+        blob = b''.join(encoded for encoded, _ in words)
+        f.write(blob)
+        f.write(b'\x00' * _padding(len(blob)))
+        f.write(np.ascontiguousarray(classifier.word_count_vectors[rows], dtype='<i8').tobytes())
+        f.write(np.ascontiguousarray(classifier.log_word_count_vectors[rows], dtype=dtype.newbyteorder('<')).tobytes())
+
+
+def load_model(filename: str, mmap_mode=True) -> NaiveBayesClassifier:
+    """
+    Load a classifier from a model file.
+
+    With `mmap_mode` the vocabulary and the count and log-probability arrays are read-only views
+    of the memory-mapped file: loading is immediate, and the classifier can predict but not be
+    updated with `partial_fit` (`train` still works, as it starts a new model). Without it, the
+    file is read into ordinary dicts and arrays, and the classifier behaves as if freshly trained.
+
+    Args:
+        - filename (str): The name of the model file.
+        - mmap_mode (bool, optional): If True, memory-map the file. Defaults to True.
+
+    Returns:
+        - NaiveBayesClassifier: The loaded classifier.
+    """
+    with open(filename, 'rb') as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, version, n_lengths, total_emails, n_spam, n_ham, n_words, laplace, float_size = _HEADER.unpack_from(buffer, 0)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        raise ValueError(f"{filename} is not a version {FORMAT_VERSION} Naive Bayes model file")
+
+    offset = _HEADER.size
+    arrays: Dict[int, np.ndarray] = {}
+    starts: Dict[int, int] = {}
+    groups = [_LENGTH_ENTRY.unpack_from(buffer, offset + i * _LENGTH_ENTRY.size) for i in range(n_lengths)]
+    offset += n_lengths * _LENGTH_ENTRY.size
+    row = 0
+    for length, count in groups:
+        arrays[length] = np.frombuffer(buffer, dtype=f'S{length}', count=count, offset=offset)
+        starts[length] = row
+        offset += length * count
+        row += count
+    offset += _padding(offset)
+    counts = np.frombuffer(buffer, dtype='<i8', count=2 * n_words, offset=offset).reshape(n_words, 2)
+    offset += counts.nbytes
+    log_counts = np.frombuffer(buffer, dtype='<f4' if float_size == 4 else '<f8', count=2 * n_words, offset=offset).reshape(n_words, 2)
+
+    classifier = NaiveBayesClassifier()
+    classifier.laplace_smoothing = bool(laplace)
+    classifier.total_emails = total_emails
+    classifier.spam_email_count = n_spam
+    classifier.ham_email_count = n_ham
+    classifier.p_spam = n_spam / total_emails if total_emails else 0
+    classifier.p_ham = n_ham / total_emails if total_emails else 0
+    with np.errstate(divide='ignore'):
+        classifier.log_email_counts = np.log([n_spam + 2 * classifier.alpha, n_ham + 2 * classifier.alpha])
+
+    vocabulary = MappedVocabulary(arrays, starts)
+    if mmap_mode:
+        classifier.vocabulary = vocabulary
+        classifier.words = vocabulary
+        classifier.word_count_vectors = counts
+        classifier.log_word_count_vectors = log_counts
+        classifier.spam_word_count = CountView(vocabulary, counts[:, 0])
+        classifier.ham_word_count = CountView(vocabulary, counts[:, 1])
+    else:
+        classifier.vocabulary = {word: i for i, word in enumerate(vocabulary)}
+        classifier.words = set(classifier.vocabulary)
+        classifier.word_count_vectors = counts.astype(np.int64)
+        classifier.log_word_count_vectors = log_counts.astype(np.float64)
+        classifier.spam_word_count = defaultdict(int, ((w, c) for w, c in zip(classifier.vocabulary, counts[:, 0].tolist()) if c))
+        classifier.ham_word_count = defaultdict(int, ((w, c) for w, c in zip(classifier.vocabulary, counts[:, 1].tolist()) if c))
+    return classifier
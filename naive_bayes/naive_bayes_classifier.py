@@ -8,8 +8,12 @@ Classes:
 
 The NaiveBayesClassifier class has methods for: 
 - initializing the classifier
-- training the classifier
+- training the classifier, optionally counting words in parallel processes
+- updating a trained classifier with new emails
+- pruning the vocabulary down to the most informative words
+- training on and predicting a stream of emails in batches
 - predicting the labels of the given emails.
+- saving the classifier to, and loading it from, a model file
 - calculating the accuracy of the classifier.
 
 University: University of Peloponnese, Department of Informatics and Telecommunications
@@ -20,9 +24,14 @@ Authors:
 - Giannopoulos Georgios
 - Giannopoulos Ioannis
 """
-from collections import defaultdict
-from typing import List, Set
+import os
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain, islice
+from typing import Iterable, Iterator, List, Optional, Set, Tuple
 import numpy as np
+from naive_bayes.feature_selection import feature_scores, select_features
+from naive_bayes.sparse_features import CSRMatrix, MappedVocabulary, to_csr
 
 class NaiveBayesClassifier():
     """
@@ -47,57 +56,204 @@ class NaiveBayesClassifier():
         """Probability of spam emails"""
         self.p_ham = 0
         """Probability of ham emails"""
-        self.p_word_given_spam = defaultdict(float)
-        """Probability of a word given that the email is spam"""
-        self.p_word_given_ham = defaultdict(float)
-        """Probability of a word given that the email is ham"""
         self.words = set()
         """Set of all unique words in spam and ham emails"""
+        self.laplace_smoothing = False
+        """Whether Laplace Smoothing is applied (set by `train`)"""
+        self.vocabulary = {}
+        """Mapping from every word in `words` to its row in the count vectors below"""
+        self.word_count_vectors = np.zeros((0, 2), dtype=np.int64)
+        """Number of spam and ham emails containing each vocabulary word, as an array of shape (len(vocabulary), 2)"""
+        self.log_word_count_vectors = np.zeros((0, 2))
+        """Log of the (smoothed) word counts: the numerators of log P(word | spam) and log P(word | ham)"""
+        self.log_email_counts = np.zeros(2)
+        """Log of the (smoothed) spam and ham email counts: the denominators of log P(word | spam) and log P(word | ham)"""
+        self.kept = None
+        """Boolean mask of the vocabulary rows that `predict` uses, after `prune_vocabulary`; None when no word is pruned"""
+        self._p_word_vectors = None
+        """Cached `p_word_vectors`, recomputed whenever the counts change; None until first needed"""
+
+    @property
+    def alpha(self) -> int:
+        """Pseudo-count added to every word count (1 with Laplace Smoothing, 0 without)."""
+        return 1 if self.laplace_smoothing else 0
+
+    @property
+    def p_word_vectors(self) -> np.ndarray:
+        """P(word | spam) and P(word | ham) for every vocabulary word, as an array of shape (len(vocabulary), 2)."""
+        if self._p_word_vectors is None:
+            self._p_word_vectors = self._word_probabilities()
+        return self._p_word_vectors
+
+    def _word_probabilities(self) -> np.ndarray:
+        """Compute `p_word_vectors` from the counts."""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return (self.word_count_vectors + self.alpha) / (np.array([self.spam_email_count, self.ham_email_count]) + 2 * self.alpha)
+
+    @property
+    def log_p_word_vectors(self) -> np.ndarray:
+        """Natural logarithm of `p_word_vectors`."""
+        return self.log_word_count_vectors - self.log_email_counts
+
+    @property
+    def p_word_given_spam(self) -> defaultdict:
+        """Probability of a word given that the email is spam"""
+        return defaultdict(float, zip(self.vocabulary, self.p_word_vectors[:, 0].tolist()))
+
+    @property
+    def p_word_given_ham(self) -> defaultdict:
+        """Probability of a word given that the email is ham"""
+        return defaultdict(float, zip(self.vocabulary, self.p_word_vectors[:, 1].tolist()))
 
-    def train(self, emails: List[str], labels: List[str], laplace_smoothing=False):
+    def train(self, emails: List[str], labels: List[str], laplace_smoothing=False, processes: Optional[int] = 1):
         """
         Train the Naive Bayes Classifier.
 
         Calculate the probabilities of spam and ham emails and 
         the probability of each word given that the email is spam or ham.
+        Any previous training is discarded.
 
         Args:
             - emails (list): A list of emails. Each element of the list is expected to be a set of words.
             - labels (list): A list of corresponding labels. Each element of the list is expected to be a string representing a label.
             - laplace_smoothing (bool, optional): If True, apply Laplace Smoothing. Defaults to False.
+            - processes (int, optional): Number of worker processes counting words (see `partial_fit`). Defaults to 1.
+        """
+        self._reset()
+        self.laplace_smoothing = laplace_smoothing
+        self.partial_fit(emails, labels, processes)
+
+    def partial_fit(self, emails: List[str], labels: List[str], processes: Optional[int] = 1):
         """
-        self.total_emails = len(emails)
-        self.spam_email_count = sum(1 for label in labels if label == 'spam')
-        self.ham_email_count = sum(1 for label in labels if label == 'ham')
+        Update the trained classifier with more emails.
+
+        The new emails are merged into the counts, and only the log-probabilities of the words
+        they contain are recomputed; the spam and ham email counts enter the log-probabilities as
+        a separate denominator per class, so the rest of the table stays valid. Training on two
+        batches with `partial_fit` gives the same model as training on both at once with `train`
+        (with the Laplace Smoothing setting of the last `train` call).
+
+        With more than one process the emails are split into shards whose word counts are computed
+        in worker processes (map) and then added together (reduce) before being merged into the
+        model once, so the result is exactly the same as counting serially.
+
+        Args:
+            - emails (list): A list of emails. Each element of the list is expected to be a set of words.
+            - labels (list): A list of corresponding labels. Each element of the list is expected to be a string representing a label.
+            - processes (int, optional): Number of worker processes. None uses all CPU cores. Defaults to 1 (no pool).
+        """
+        self._merge_counts(*_add_counts(_map_shards(_count_words, emails, labels, processes)))
+
+    def _reset(self):
+        """Discard any previous training."""
+        self.__init__()
+
+    def _merge_counts(self, n_emails: int, n_spam: int, n_ham: int, spam_counts: Counter, ham_counts: Counter):
+        """
+        Merge the counts of a batch of emails (see `_count_words`) into the model and update
+        the probabilities they affect.
+        """
+        if isinstance(self.vocabulary, MappedVocabulary):
+            raise TypeError("A memory-mapped model is read-only; load it with mmap_mode=False to update it")
+        self.total_emails += n_emails
+        self.spam_email_count += n_spam
+        self.ham_email_count += n_ham
 
         # Calculate the probability of spam and ham emails
         self.p_spam = self.spam_email_count / self.total_emails
         self.p_ham = self.ham_email_count / self.total_emails
 
-        # Count the number of times each word appears in spam and ham emails
-        for email, label in zip(emails, labels):
-            if label == 'spam':
-                for word in email:
-                    self.spam_word_count[word] += 1
-            elif label == 'ham':
-                for word in email:
-                    self.ham_word_count[word] += 1
+        # Add the number of times each word appears in spam and ham emails
+        for word, count in spam_counts.items():
+            self.spam_word_count[word] += count
+        for word, count in ham_counts.items():
+            self.ham_word_count[word] += count
+        touched = spam_counts.keys() | ham_counts.keys()
 
-        # Create a set that will contain all unique words from spam and ham emails
-        # so we can iterate all the words to calculate the probabilities
-        self.words = set(self.spam_word_count.keys()).union(set(self.ham_word_count.keys()))
+        # Give the words seen for the first time their own rows in the vectors
+        new_words = sorted(touched - self.words)
+        self.words.update(new_words)
+        for word in new_words:
+            self.vocabulary[word] = len(self.vocabulary)
+        if new_words:
+            self.word_count_vectors = np.concatenate([self.word_count_vectors, np.zeros((len(new_words), 2), dtype=np.int64)])
+            self.log_word_count_vectors = np.concatenate([self.log_word_count_vectors, np.zeros((len(new_words), 2))])
 
-        # Calculate the probability of each word given that the email is spam or ham
+        # Recalculate the log-probability numerators of the words in the new emails only
         # If laplace_smoothing is True, apply Laplace Smoothing
-        if laplace_smoothing:
-            for word in self.words:
-                self.p_word_given_spam[word] = (self.spam_word_count[word] + 1) / (self.spam_email_count + 2)
-                self.p_word_given_ham[word] = (self.ham_word_count[word] + 1) / (self.ham_email_count + 2)
-        else:
-            for word in self.words:
-                self.p_word_given_spam[word] = self.spam_word_count[word] / self.spam_email_count
-                self.p_word_given_ham[word] = self.ham_word_count[word] / self.ham_email_count
+        rows = np.fromiter(map(self.vocabulary.__getitem__, touched), dtype=np.int64, count=len(touched))
+        if self.kept is not None:
+            # new words, and pruned words seen again, are used by predict
+            self.kept = np.concatenate([self.kept, np.ones(len(new_words), dtype=bool)])
+            self.kept[rows] = True
+        self.word_count_vectors[rows, 0] = [self.spam_word_count.get(word, 0) for word in touched]
+        self.word_count_vectors[rows, 1] = [self.ham_word_count.get(word, 0) for word in touched]
+        with np.errstate(divide='ignore'):
+            self.log_word_count_vectors[rows] = np.log(self.word_count_vectors[rows] + self.alpha)
+            self.log_email_counts = np.log([self.spam_email_count + 2 * self.alpha, self.ham_email_count + 2 * self.alpha])
+        # every probability changes with the email counts, so predict reuses this until the next batch
+        self._p_word_vectors = self._word_probabilities()
         
+    def train_stream(self, records: Iterable[Tuple[set, str]], laplace_smoothing=False, batch_size=1000):
+        """
+        Train the Naive Bayes Classifier on a stream of (email, label) records, e.g. from
+        `data.clean_data.iter_clean_emails`. The stream is consumed in batches of `batch_size`
+        records passed to `partial_fit`, so only one batch is held in memory at a time.
+        Any previous training is discarded.
+
+        Args:
+            - records (iterable): (email, label) pairs. Each email is expected to be a set of words.
+            - laplace_smoothing (bool, optional): If True, apply Laplace Smoothing. Defaults to False.
+            - batch_size (int, optional): Number of records counted at a time. Defaults to 1000.
+        """
+        self._reset()
+        self.laplace_smoothing = laplace_smoothing
+        for batch in _batches(records, batch_size):
+            emails, labels = zip(*batch)
+            self.partial_fit(emails, labels)
+
+    def predict_stream(self, records: Iterable[Tuple[set, str]], prevent_underflow=False, batch_size=1000) -> Iterator[Tuple[str, str]]:
+        """
+        Predict the labels of a stream of (email, label) records, scoring `batch_size` records at a time.
+
+        Args:
+            - records (iterable): (email, label) pairs. Each email is expected to be a set of words.
+            - prevent_underflow (bool, optional): If True, prevent underflow by using the log probabilities. Defaults to False.
+            - batch_size (int, optional): Number of records scored at a time. Defaults to 1000.
+
+        Yields:
+            - (label, prediction) (tuple): The true and the predicted label of each record.
+        """
+        for batch in _batches(records, batch_size):
+            emails, labels = zip(*batch)
+            yield from zip(labels, self.predict(emails, prevent_underflow))
+
+    def prune_vocabulary(self, k: Optional[int] = None, threshold: Optional[float] = None, method='mutual_information') -> int:
+        """
+        Keep only the most informative words of the trained classifier for `predict`, which then
+        ignores the rest like unknown words. Words are ranked by the mutual information or the
+        chi-square statistic between their presence in an email and its label (see
+        `naive_bayes.feature_selection`). Pruned words keep their counts (only `kept` marks them),
+        so `partial_fit` still gives the same model as `train`; words that are pruned and seen
+        again by `partial_fit` are used by `predict` again. `save` writes only the kept words.
+
+        Args:
+            - k (int, optional): Keep at most this many words, the best-scoring ones.
+            - threshold (float, optional): Keep only words scoring at least this much.
+            - method (str, optional): 'mutual_information' or 'chi_square'. Defaults to 'mutual_information'.
+
+        Returns:
+            - int: The number of words removed.
+        """
+        if isinstance(self.vocabulary, MappedVocabulary):
+            raise TypeError("A memory-mapped model is read-only; load it with mmap_mode=False to prune it")
+        kept = self.kept if self.kept is not None else np.ones(len(self.vocabulary), dtype=bool)
+        scores = feature_scores(self.word_count_vectors, self.spam_email_count, self.ham_email_count, method)
+        keep = select_features(np.where(kept, scores, -np.inf), k, threshold) & kept
+        removed = int(kept.sum() - keep.sum())
+        self.kept = keep
+        return removed
+
     def predict(self, emails, prevent_underflow=False) -> List[str]:
         """
         Predict the labels of the given emails.
@@ -106,61 +262,132 @@ class NaiveBayesClassifier():
         of the email being spam or ham can become very small, close to 0, 
         leading to underflow when multiplying the probabilities.
         To prevent underflow, set `prevent_underflow` to True to use the log probabilities.
+
+        The whole batch is scored at once: the emails are turned into a sparse
+        indicator matrix over the vocabulary and multiplied with the cached
+        per-word log-probability numerators (or the word probabilities).
         
         Args:
             - emails (list): A list of emails. Each element of the list is expected to be a set of words.
             - prevent_underflow (bool, optional): If True, prevent underflow by using the log probabilities. Defaults to False.
         """
-        y_pred = []
-        if prevent_underflow:
-            for email in emails:
-                # calculate the log probabilities
-                p_spam_given_email = np.log(self.p_spam)
-                p_ham_given_email = np.log(self.p_ham)
-
-                for word in email:
-                    if word in self.words:
-                        p_spam_given_email += np.log(self.p_word_given_spam[word])
-                        p_ham_given_email += np.log(self.p_word_given_ham[word])
-                # predict the label based on the probabilities
-                if p_spam_given_email > p_ham_given_email:
-                    y_pred.append('spam')
-                else:
-                    y_pred.append('ham')     
-        else:
-            # iterate over each email
-            for email in emails:
-                p_spam_given_email = self.p_spam
-                p_ham_given_email = self.p_ham
-
-                # iterate over each word in the email
-                for word in email:
-
-                    # if the word is in the set of unique words, update the probabilities, otherwise the word was not in the training set so we ignore it
-                    if word in self.words:
-                        p_spam_given_email *= self.p_word_given_spam[word]
-                        p_ham_given_email *= self.p_word_given_ham[word]
-                # predict the label based on the probabilities
-                if p_spam_given_email > p_ham_given_email:
-                    y_pred.append('spam')
-                else:
-                    y_pred.append('ham')
-                    
+        X = self._features(list(emails))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            if prevent_underflow:
+                # sum the log probabilities of the words of each email:
+                # sum of log(count + alpha) minus (number of known words) * log(emails + 2 * alpha)
+                known_words = np.diff(X.indptr)
+                scores = (X.dot(self.log_word_count_vectors) - np.outer(known_words, self.log_email_counts)
+                          + np.log([self.p_spam, self.p_ham]))
+            else:
+                p_word_vectors = self.p_word_vectors
+                scores = np.stack([self.p_spam * X.prod(p_word_vectors[:, 0]),
+                                   self.p_ham * X.prod(p_word_vectors[:, 1])], axis=1)
+        # predict the label based on the probabilities
+        y_pred = ['spam' if is_spam else 'ham' for is_spam in scores[:, 0] > scores[:, 1]]
         return y_pred
-            
+
+    def _features(self, emails: List[set]) -> CSRMatrix:
+        """
+        Return the indicator matrix of the emails over the rows of the count vectors.
+        """
+        # One row per email, one column per vocabulary word; words that were not
+        # in the training set have no column, so they are ignored.
+        vocabulary = self.vocabulary
+        if isinstance(vocabulary, MappedVocabulary):
+            # look up the distinct words of the batch at once instead of word by word
+            vocabulary = vocabulary.lookup(chain.from_iterable(emails))
+        return to_csr(emails, vocabulary, kept=self.kept, n_cols=len(self.vocabulary))
     
-    def accuracy(self, y_true: List[str], y_pred: List[str]) -> float:
+    def save(self, filename: str, dtype=np.float64):
+        """
+        Save the trained classifier to a compact binary model file (see `naive_bayes.model_file`).
+
+        Args:
+            - filename (str): The name of the file to write.
+            - dtype (optional): np.float32 or np.float64, the precision of the stored log-probabilities. Defaults to np.float64.
+        """
+        from naive_bayes.model_file import save_model
+        save_model(self, filename, dtype)
+
+    @classmethod
+    def load(cls, filename: str, mmap_mode=True) -> 'NaiveBayesClassifier':
         """
-        Calculate the accuracy of the classifier.
+        Load a classifier saved with `save`. With `mmap_mode` the model arrays are memory-mapped
+        read-only views of the file, shared between processes that load the same file.
+
+        Args:
+            - filename (str): The name of the model file.
+            - mmap_mode (bool, optional): If True, memory-map the file. Defaults to True.
         """
-        correct_prediction = 0
-        for yt, yp in zip(y_true, y_pred):
-            if yt == yp:
-                correct_prediction += 1
+        from naive_bayes.model_file import load_model
+        return load_model(filename, mmap_mode)
 
-        return correct_prediction / len(y_true)
+    def accuracy(self, y_true: List[str], y_pred: List[str]) -> float:
+        """
+        Calculate the accuracy of the classifier (see `naive_bayes.evaluation` for more metrics).
+        """
+        return np.count_nonzero(np.asarray(y_true) == np.asarray(y_pred)) / len(y_true)
     
     def __repr__(self) -> str:
         return f"NaiveBayesClassifier(spam_email_count={self.spam_email_count}, ham_email_count={self.ham_email_count}, total_emails={self.total_emails}, unique_words={len(self.words)}, p_spam={self.p_spam}, p_ham={self.p_ham})"
     
         
+
+
+def _batches(records: Iterable, batch_size: int) -> Iterator[list]:
+    """Split a stream into lists of at most batch_size records."""
+    records = iter(records)
+    while True:
+        batch = list(islice(records, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def _map_shards(function, emails: List[set], labels: List[str], processes: Optional[int]) -> Iterator:
+    """
+    Apply function(emails, labels) to shards of the emails in up to `processes` worker processes
+    (None uses all CPU cores, 1 calls it once in this process) and yield the results in order.
+    """
+    processes = processes or os.cpu_count() or 1
+    if processes == 1:
+        yield function(emails, labels)
+        return
+    # a few shards per process so that uneven shards still keep every worker busy
+    shard_size = max(1, -(-len(emails) // (4 * processes)))
+    starts = range(0, max(len(emails), 1), shard_size)
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        yield from pool.map(function, (emails[i:i + shard_size] for i in starts),
+                            (labels[i:i + shard_size] for i in starts))
+
+
+def _count_words(emails: List[set], labels: List[str]) -> Tuple[int, int, int, Counter, Counter]:
+    """
+    Count a batch of emails: the number of emails, of spam and of ham emails, and the number of
+    spam and of ham emails each word appears in. Emails with other labels only count towards
+    the total.
+    """
+    spam_counts, ham_counts = Counter(), Counter()
+    n_spam = n_ham = 0
+    for email, label in zip(emails, labels):
+        if label == 'spam':
+            n_spam += 1
+            spam_counts.update(email)
+        elif label == 'ham':
+            n_ham += 1
+            ham_counts.update(email)
+    return len(emails), n_spam, n_ham, spam_counts, ham_counts
+
+
+def _add_counts(shards: Iterable[Tuple[int, int, int, Counter, Counter]]) -> Tuple[int, int, int, Counter, Counter]:
+    """Add up the counts of several batches of emails, into the counters of the first one."""
+    shards = iter(shards)
+    n_emails, n_spam, n_ham, spam_counts, ham_counts = next(shards)
+    for shard in shards:
+        n_emails += shard[0]
+        n_spam += shard[1]
+        n_ham += shard[2]
+        spam_counts.update(shard[3])
+        ham_counts.update(shard[4])
+    return n_emails, n_spam, n_ham, spam_counts, ham_counts
@@ -0,0 +1,290 @@
+"""
+## Scoring service
+
+This module serves a trained NaiveBayesClassifier over HTTP on a local TCP port or a Unix
+socket, using asyncio. Each request scores one email, but requests that arrive close together
+are gathered into one batched `predict` call: a batch is scored as soon as it holds `max_batch`
+emails or `max_delay` seconds after its first email arrived. Emails wait in a bounded queue;
+when it is full, connection handlers stop reading new requests until there is room, which
+pushes back on the clients instead of letting memory grow.
+
+Endpoints:
+- POST /predict: the request body is the raw email text; the response is {"label": "spam" | "ham"}.
+- GET /stats: request and batch counts and the latency percentiles of recent requests.
+
+Run it with `python -m naive_bayes.scoring_service MODEL_FILE [--port PORT | --unix PATH]`,
+where MODEL_FILE was written by NaiveBayesClassifier.save.
+
+Classes:
+- LatencyStats: Latencies of the most recent requests and their percentiles.
+- MicroBatcher: Gathers single emails into batched predict calls.
+- ScoringService: The HTTP server in front of a MicroBatcher.
+
+University: University of Peloponnese, Department of Informatics and Telecommunications
+
+Course: Artificial Intelligence
+
+Authors:
+- Giannopoulos Georgios
+- Giannopoulos Ioannis
+"""
+import argparse
+import asyncio
+import json
+import time
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from data.clean_data import clean_str
+from naive_bayes.naive_bayes_classifier import NaiveBayesClassifier
+
+_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 413: 'Payload Too Large',
+            500: 'Internal Server Error'}
+
+class LatencyStats():
+    """
+    Latencies, in seconds, of the last `window` requests.
+    """
+
+    def __init__(self, window: int = 10000) -> None:
+        self.latencies = deque(maxlen=window)
+        """The most recent latencies"""
+
+    def add(self, latencies: Iterable[float]):
+        self.latencies.extend(latencies)
+
+    def percentiles(self, q: Iterable[float] = (50, 90, 99)) -> Dict[str, float]:
+        """
+        Return the given percentiles of the recent latencies in milliseconds, as {'p50': ..., ...}
+        (empty if no request has been recorded yet).
+        """
+        if not self.latencies:
+            return {}
+        values = np.percentile(np.fromiter(self.latencies, dtype=float), list(q)) * 1000
+        return {f'p{p:g}': float(v) for p, v in zip(q, values)}
+
+
+class MicroBatcher():
+    """
+    Gathers emails submitted one at a time into batched predict calls. Each batch is scored in
+    the loop's default executor, so the event loop keeps accepting requests meanwhile.
+    """
+
+    def __init__(self, classifier: NaiveBayesClassifier, max_batch: int = 256, max_delay: float = 0.002,
+                 max_queue: int = 4096, prevent_underflow: bool = True) -> None:
+        """
+        Args:
+            - classifier (NaiveBayesClassifier): The trained classifier.
+            - max_batch (int, optional): Largest number of emails scored in one call. Defaults to 256.
+            - max_delay (float, optional): Longest time, in seconds, that the first email of a batch waits for more. Defaults to 0.002.
+            - max_queue (int, optional): Largest number of emails waiting to be scored; `submit` waits while the queue is full. Defaults to 4096.
+            - prevent_underflow (bool, optional): Passed on to `predict`. Defaults to True.
+        """
+        assert max_batch >= 1 and max_delay >= 0 and max_queue >= 1
+        self.classifier = classifier
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.prevent_underflow = prevent_underflow
+        self.queue: Optional[asyncio.Queue] = None
+        self.max_queue = max_queue
+        self.stats = LatencyStats()
+        """Latencies from `submit` to the prediction"""
+        self.n_batches = 0
+        """Number of predict calls"""
+        self.n_emails = 0
+        """Number of emails scored"""
+        self._worker: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start the batching task on the running event loop."""
+        self.queue = asyncio.Queue(self.max_queue)
+        self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Stop the batching task. Emails still in the queue are not scored."""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    async def submit(self, email: set) -> str:
+        """
+        Queue a cleaned email and wait for its predicted label.
+        """
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((email, future, time.perf_counter()))
+        return await future
+
+    async def _next_batch(self) -> List[Tuple[set, asyncio.Future, float]]:
+        """Wait for an email, then for more until the batch is full or max_delay has passed."""
+        loop = asyncio.get_running_loop()
+        batch = [await self.queue.get()]
+        deadline = loop.time() + self.max_delay
+        while len(batch) < self.max_batch:
+            # take whatever is already queued without waiting
+            while len(batch) < self.max_batch and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            remaining = deadline - loop.time()
+            if len(batch) >= self.max_batch or remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._next_batch()
+            try:
+                labels = await loop.run_in_executor(None, self.classifier.predict,
+                                                    [email for email, _, _ in batch], self.prevent_underflow)
+            except Exception as error:
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(error)
+                continue
+            done = time.perf_counter()
+            for (_, future, _), label in zip(batch, labels):
+                if not future.done():
+                    future.set_result(label)
+            self.stats.add(done - start for _, _, start in batch)
+            self.n_batches += 1
+            self.n_emails += len(batch)
+
+    def summary(self) -> dict:
+        """Return the counters and latency percentiles as a JSON-serializable dict."""
+        return {'emails': self.n_emails, 'batches': self.n_batches,
+                'mean_batch_size': self.n_emails / self.n_batches if self.n_batches else 0,
+                'queued': self.queue.qsize() if self.queue is not None else 0,
+                'latency_ms': self.stats.percentiles()}
+
+
+class ScoringService():
+    """
+    Minimal HTTP/1.1 server (keep-alive, Content-Length bodies) scoring emails with a MicroBatcher.
+    """
+
+    def __init__(self, classifier: NaiveBayesClassifier, host: str = '127.0.0.1', port: int = 8080,
+                 path: Optional[str] = None, max_body: int = 1 << 20, **batcher_options) -> None:
+        """
+        Args:
+            - classifier (NaiveBayesClassifier): The trained classifier.
+            - host (str, optional): Address to listen on. Defaults to '127.0.0.1'.
+            - port (int, optional): TCP port to listen on; 0 picks a free port. Defaults to 8080.
+            - path (str, optional): If given, listen on this Unix socket instead of TCP.
+            - max_body (int, optional): Largest accepted request body in bytes. Defaults to 1 MiB.
+            - batcher_options: Passed on to MicroBatcher (max_batch, max_delay, max_queue, prevent_underflow).
+        """
+        self.batcher = MicroBatcher(classifier, **batcher_options)
+        self.host = host
+        self.port = port
+        self.path = path
+        self.max_body = max_body
+        self.server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self):
+        """Start the batcher and begin listening. With port 0, `port` is set to the chosen port."""
+        self.batcher.start()
+        if self.path is not None:
+            self.server = await asyncio.start_unix_server(self._handle, self.path)
+        else:
+            self.server = await asyncio.start_server(self._handle, self.host, self.port)
+            self.port = self.server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        """Stop listening and stop the batcher."""
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+        await self.batcher.stop()
+
+    async def serve_forever(self):
+        await self.start()
+        try:
+            await self.server.serve_forever()
+        finally:
+            await self.close()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if not line.strip():
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                parts = request_line.decode('latin-1').split()
+                try:
+                    length = int(headers.get('content-length', 0) or 0)
+                except ValueError:
+                    length = -1
+                if len(parts) != 3 or length < 0:
+                    await self._respond(writer, 400, {'error': 'malformed request'}, close=True)
+                    break
+                if length > self.max_body:
+                    await self._respond(writer, 413, {'error': 'request body too large'}, close=True)
+                    break
+                body = await reader.readexactly(length)
+                close = headers.get('connection', '').lower() == 'close' or parts[2] == 'HTTP/1.0'
+                try:
+                    status, payload = await self._route(parts[0], parts[1], body)
+                except Exception as error:
+                    status, payload = 500, {'error': str(error)}
+                await self._respond(writer, status, payload, close)
+                if close:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _route(self, method: str, target: str, body: bytes) -> Tuple[int, dict]:
+        if target == '/predict':
+            if method != 'POST':
+                return 405, {'error': 'use POST'}
+            label = await self.batcher.submit(clean_str(body.decode('utf-8', errors='replace')))
+            return 200, {'label': label}
+        if target == '/stats':
+            if method != 'GET':
+                return 405, {'error': 'use GET'}
+            return 200, self.batcher.summary()
+        return 404, {'error': 'no such endpoint'}
+
+    async def _respond(self, writer: asyncio.StreamWriter, status: int, payload: dict, close: bool):
+        body = json.dumps(payload).encode()
+        writer.write(f"HTTP/1.1 {status} {_REASONS[status]}\r\nContent-Type: application/json\r\n"
+                     f"Content-Length: {len(body)}\r\nConnection: {'close' if close else 'keep-alive'}\r\n\r\n".encode() + body)
+        await writer.drain()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a saved Naive Bayes spam classifier over HTTP.")
+    parser.add_argument('model', help="model file written by NaiveBayesClassifier.save")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--unix', help="listen on this Unix socket instead of TCP")
+    parser.add_argument('--max-batch', type=int, default=256)
+    parser.add_argument('--max-delay', type=float, default=0.002, help="seconds")
+    parser.add_argument('--max-queue', type=int, default=4096)
+    args = parser.parse_args()
+    service = ScoringService(NaiveBayesClassifier.load(args.model), args.host, args.port, args.unix,
+                             max_batch=args.max_batch, max_delay=args.max_delay, max_queue=args.max_queue)
+    try:
+        asyncio.run(service.serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
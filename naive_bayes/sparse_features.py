@@ -0,0 +1,220 @@
+"""
+## Sparse features
+
+This module turns batches of emails into sparse word-indicator matrices in CSR
+(compressed sparse row) form and scores them against per-word weight vectors, so that a
+whole batch is classified with a few NumPy operations instead of a Python loop per word.
+
+Classes:
+- CSRMatrix: A boolean indicator matrix in CSR form (row pointers and column indices).
+- MappedVocabulary: A read-only word -> column mapping over sorted, fixed-width word arrays
+  (for example memory-mapped from a model file), looked up with vectorized binary search.
+
+Functions:
+- build_vocabulary: Returns a word -> column index mapping for a set of words.
+- to_csr: Returns the CSR indicator matrix of a batch of emails for a vocabulary.
+- hash_emails: Returns the CSR indicator matrix of a batch of emails over a fixed number of hash buckets.
+
+University: University of Peloponnese, Department of Informatics and Telecommunications
+
+Course: Artificial Intelligence
+
+Authors:
+- Giannopoulos Georgios
+- Giannopoulos Ioannis
+"""
+from collections import defaultdict
+from collections.abc import Mapping
+from itertools import chain, repeat
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from zlib import crc32
+import numpy as np
+
+class CSRMatrix():
+    """
+    Indicator matrix of shape (n_rows, n_cols) in CSR form.
+
+    The column indices of the non-zero entries of row i are indices[indptr[i]:indptr[i + 1]],
+    and every non-zero entry is 1.
+    """
+
+    def __init__(self, indptr: np.ndarray, indices: np.ndarray, n_cols: int) -> None:
+        self.indptr = indptr
+        """Row pointers, of length n_rows + 1"""
+        self.indices = indices
+        """Column index of each non-zero entry"""
+        self.n_cols = n_cols
+        """Number of columns"""
+
+    @property
+    def shape(self):
+        return (len(self.indptr) - 1, self.n_cols)
+
+    def row_ids(self) -> np.ndarray:
+        """
+        Return the row index of every non-zero entry.
+        """
+        return np.repeat(np.arange(self.shape[0]), np.diff(self.indptr))
+
+    def dot(self, weights: np.ndarray) -> np.ndarray:
+        """
+        Return the matrix product with weights, an array of shape (n_cols,) or (n_cols, k).
+
+        Entries of weights equal to -inf propagate to the rows that contain them, as they would
+        when summing the log-probabilities one by one.
+        """
+        rows = self.row_ids()
+        gathered = weights[self.indices]
+        if gathered.ndim == 1:
+            return np.bincount(rows, weights=gathered, minlength=self.shape[0])
+        return np.stack([np.bincount(rows, weights=gathered[:, k], minlength=self.shape[0])
+                         for k in range(gathered.shape[1])], axis=1)
+
+    def prod(self, weights: np.ndarray) -> np.ndarray:
+        """
+        Return, for every row, the product of weights over the row's non-zero columns
+        (1 for an empty row).
+        """
+        result = np.ones(self.shape[0])
+        starts = self.indptr[:-1]
+        nonempty = self.indptr[1:] > starts
+        if nonempty.any():
+            result[nonempty] = np.multiply.reduceat(weights[self.indices], starts[nonempty])
+        return result
+
+    def __repr__(self) -> str:
+        return f"CSRMatrix(shape={self.shape}, nnz={len(self.indices)})"
+
+
+class MappedVocabulary(Mapping):
+    """
+    Read-only vocabulary stored as sorted arrays of UTF-8 encoded words, one array per encoded
+    length, so that the arrays have a fixed width and need no padding. Word `arrays[L][i]` has
+    column `starts[L] + i`. Nothing is copied or hashed up front, which makes it suitable for
+    arrays memory-mapped from a file; `lookup` finds many words at once with `np.searchsorted`.
+    Words must not contain NUL characters.
+    """
+
+    def __init__(self, arrays: Dict[int, np.ndarray], starts: Dict[int, int]) -> None:
+        self.arrays = arrays
+        """Sorted array of dtype 'S{L}' for every encoded word length L"""
+        self.starts = starts
+        """Column of the first word of every array"""
+
+    def lookup(self, words: Iterable[str]) -> Dict[str, int]:
+        """
+        Look up many words at once.
+
+        Args:
+            - words (iterable): The words to look up; duplicates are looked up once.
+
+        Returns:
+            - dict: Mapping from each of the words found in the vocabulary to its column.
+        """
+        by_length: Dict[int, List[Tuple[str, bytes]]] = defaultdict(list)
+        for word in set(words):
+            encoded = word.encode('utf-8')
+            if len(encoded) in self.arrays:
+                by_length[len(encoded)].append((word, encoded))
+        found = {}
+        for length, items in by_length.items():
+            array = self.arrays[length]
+            keys = np.array([encoded for _, encoded in items], dtype=f'S{length}')
+            positions = np.minimum(np.searchsorted(array, keys), len(array) - 1)
+            for (word, _), position, hit in zip(items, positions.tolist(), (array[positions] == keys).tolist()):
+                if hit:
+                    found[word] = self.starts[length] + position
+        return found
+
+    def __getitem__(self, word: str) -> int:
+        return self.lookup([word])[word]
+
+    def __contains__(self, word) -> bool:
+        return isinstance(word, str) and word in self.lookup([word])
+
+    def __iter__(self) -> Iterator[str]:
+        for length in sorted(self.arrays, key=self.starts.get):
+            for encoded in self.arrays[length]:
+                yield encoded.decode('utf-8')
+
+    def __len__(self) -> int:
+        return sum(len(array) for array in self.arrays.values())
+
+    def __repr__(self) -> str:
+        return f"MappedVocabulary(words={len(self)})"
+
+
+def build_vocabulary(words: Iterable[str]) -> Dict[str, int]:
+    """
+    Build a vocabulary index, mapping every word to a column. Words are sorted so that the
+    index does not depend on set iteration order.
+
+    Args:
+        - words (iterable): The words of the vocabulary.
+
+    Returns:
+        - dict: Mapping from word to column index.
+    """
+    return {word: i for i, word in enumerate(sorted(words))}
+
+
+def to_csr(emails: Iterable[Iterable[str]], vocabulary: Dict[str, int], kept: Optional[np.ndarray] = None,
+           n_cols: Optional[int] = None) -> CSRMatrix:
+    """
+    Build the indicator matrix of a batch of emails. Words missing from the vocabulary are
+    ignored, as they were not seen during training.
+
+    Args:
+        - emails (iterable): The emails. Each email is expected to be a set of words.
+        - vocabulary (dict): Mapping from word to column index.
+        - kept (np.ndarray, optional): Boolean mask of the columns. If given, words in columns
+          where it is False are ignored too, as pruned words.
+        - n_cols (int, optional): The number of columns, if vocabulary holds only some of the
+          words (e.g. a batch lookup of a MappedVocabulary). Defaults to len(vocabulary).
+
+    Returns:
+        - CSRMatrix: One row per email, one column per vocabulary word.
+    """
+    emails = emails if isinstance(emails, list) else list(emails)
+    lengths = np.fromiter(map(len, emails), dtype=np.int64, count=len(emails))
+    # Look every word up in one pass (-1 for unknown words), then drop the unknown ones
+    columns = np.fromiter(map(vocabulary.get, chain.from_iterable(emails), repeat(-1)),
+                          dtype=np.int64, count=int(lengths.sum()))
+    known = columns >= 0
+    if kept is not None:
+        known[known] = kept[columns[known]]
+    rows = np.repeat(np.arange(len(emails)), lengths)[known]
+    indptr = np.zeros(len(emails) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=len(emails)), out=indptr[1:])
+    return CSRMatrix(indptr, columns[known], len(vocabulary) if n_cols is None else n_cols)
+
+
+def hash_emails(emails: Iterable[Iterable[str]], n_buckets: int, seen: Optional[np.ndarray] = None) -> CSRMatrix:
+    """
+    Build the indicator matrix of a batch of emails over hash buckets instead of vocabulary words
+    (the hashing trick): an email has a 1 in the bucket of each of its words, once per bucket even
+    if several of its words share it. A word's bucket is the CRC-32 of its UTF-8 encoding modulo
+    n_buckets; unlike the built-in `hash` it is the same in every process and every run.
+
+    Args:
+        - emails (iterable): The emails. Each email is expected to be a set of words.
+        - n_buckets (int): The number of buckets (columns).
+        - seen (np.ndarray, optional): Boolean mask of shape (n_buckets,). If given, buckets where
+          it is False are left out, as the words that were not seen during training.
+
+    Returns:
+        - CSRMatrix: One row per email, one column per bucket.
+    """
+    emails = emails if isinstance(emails, list) else list(emails)
+    lengths = np.fromiter(map(len, emails), dtype=np.int64, count=len(emails))
+    codes = np.fromiter(map(crc32, map(str.encode, chain.from_iterable(emails))),
+                        dtype=np.int64, count=int(lengths.sum()))
+    # one key per (email, bucket) pair; np.unique drops repeated buckets and sorts by email
+    keys = np.unique(np.repeat(np.arange(len(emails)), lengths) * n_buckets + codes % n_buckets)
+    rows, columns = np.divmod(keys, n_buckets)
+    if seen is not None:
+        known = seen[columns]
+        rows, columns = rows[known], columns[known]
+    indptr = np.zeros(len(emails) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=len(emails)), out=indptr[1:])
+    return CSRMatrix(indptr, columns, n_buckets)
@@ -7,15 +7,22 @@ and a utility function for handling events.
 Classes:
 - ProbDist: Represents a discrete probability distribution. You name the random variable
   in the constructor, then assign and query probability of values.
+- ArrayProbDist: A distribution over a fixed, indexed domain of values, stored as one NumPy
+  array of probabilities or log-probabilities.
+- BatchProbDist: Many distributions of the same variable, stored as the rows of one 2-D array.
 
 Functions:
 - event_values: Returns a tuple of the values of variables in an event.
+- logsumexp: Returns the logarithm of the sum of exponentials, computed without overflow.
 
 The ProbDist class has methods for: 
 - setting and getting the probability of a value 
 - normalizing the distribution, 
 - representing the distribution as a string.
 
+ArrayProbDist and BatchProbDist also normalize in log space (with log-sum-exp) when they hold
+log-probabilities, which avoids underflow for very small probabilities.
+
 University: University of Peloponnese, Department of Informatics and Telecommunications
 
 Course: Artificial Intelligence
@@ -26,6 +33,11 @@ Authors:
 """
 import numpy as np
 from typing import Dict, List, Optional, Tuple, Union
+
+NORMALIZE_TOLERANCE = 1e-05 + 1e-08
+"""ProbDist.normalize leaves totals this close to 1 as they are (the default
+tolerance of np.isclose(total, 1.0), without its per-call array overhead)."""
+
 class ProbDist:
     """A discrete probability distribution. You name the random variable
     in the constructor, then assign and query probability of values.
@@ -56,7 +68,7 @@ class ProbDist:
 
     def __setitem__(self, val: Union[str, int], p: float):
         """Set P(val) = p."""
-        if val not in self.values:
+        if val not in self.prob:
             self.values.append(val)
         self.prob[val] = p
 
@@ -65,7 +77,7 @@ class ProbDist:
         Returns the normalized distribution.
         Raises a ZeroDivisionError if the sum of the values is 0."""
         total = sum(self.prob.values())
-        if not np.isclose(total, 1.0):
+        if not abs(total - 1.0) <= NORMALIZE_TOLERANCE:
             for val in self.prob:
                 self.prob[val] /= total
         return self
@@ -79,6 +91,171 @@ class ProbDist:
         return "P({})".format(self.var_name)
 
 
+def logsumexp(a: np.ndarray, axis: int = -1) -> np.ndarray:
+    """Return log(sum(exp(a))) along axis, shifting by the maximum so that
+    the exponentials cannot overflow. All -inf gives -inf."""
+    a = np.asarray(a, dtype=float)
+    m = np.max(a, axis=axis, keepdims=True)
+    m = np.where(np.isfinite(m), m, 0.0)
+    with np.errstate(divide='ignore'):
+        return np.squeeze(m, axis=axis) + np.log(np.sum(np.exp(a - m), axis=axis))
+
+
+class ArrayProbDist:
+    """A discrete probability distribution over a fixed domain of values,
+    stored as one array indexed by the position of each value in domain.
+    With log=True the array holds log-probabilities. Indexing and
+    assignment take and return probabilities in both cases, like ProbDist.
+    >>> P = ArrayProbDist('Flip', ('H', 'T')); P['H'], P['T'] = 1, 3
+    >>> P.normalize()['T']
+    0.75
+    >>> P = ArrayProbDist('X', (True, False), np.log([2e-300, 6e-300]), log=True)
+    >>> P.normalize().show_approx()
+    'False: 0.75, True: 0.25'
+    """
+
+    __slots__ = ('var_name', 'domain', 'index', 'array', 'log')
+
+    def __init__(self, var_name: str = '?', domain: Tuple = (True, False), array: Optional[np.ndarray] = None,
+                 log: bool = False, index: Optional[Dict] = None, copy: bool = True):
+        """array defaults to all zero probabilities, and is copied unless
+        copy is False. index, the position of every value of domain, can be
+        passed in to share it between distributions over the same domain."""
+        self.var_name = var_name
+        self.domain = tuple(domain)
+        self.index = index if index is not None else {v: i for i, v in enumerate(self.domain)}
+        if array is None:
+            array = np.full(len(self.domain), -np.inf if log else 0.0)
+        self.array = np.array(array, dtype=float) if copy else np.asarray(array, dtype=float)
+        assert self.array.shape == (len(self.domain),), "array must have one entry per value of domain"
+        self.log = log
+
+    def __getitem__(self, val) -> float:
+        """Given a value, return P(value) (0 for values outside the domain)."""
+        i = self.index.get(val)
+        if i is None:
+            return 0
+        return float(np.exp(self.array[i])) if self.log else float(self.array[i])
+
+    def __setitem__(self, val, p: float):
+        """Set P(val) = p. val must be in the domain."""
+        i = self.index[val]
+        if self.log:
+            with np.errstate(divide='ignore'):
+                self.array[i] = np.log(p)
+        else:
+            self.array[i] = p
+
+    @property
+    def values(self) -> List:
+        return list(self.domain)
+
+    @property
+    def prob(self) -> Dict:
+        """The distribution as a value -> probability dict."""
+        return dict(zip(self.domain, self.probabilities.tolist()))
+
+    @property
+    def probabilities(self) -> np.ndarray:
+        return np.exp(self.array) if self.log else self.array
+
+    @property
+    def log_probabilities(self) -> np.ndarray:
+        if self.log:
+            return self.array
+        with np.errstate(divide='ignore'):
+            return np.log(self.array)
+
+    def normalize(self) -> 'ArrayProbDist':
+        """Make the probabilities sum to 1, in log space if log is set.
+        Returns the normalized distribution.
+        Raises a ZeroDivisionError if the sum of the values is 0."""
+        if self.log:
+            total = logsumexp(self.array)
+            if total == -np.inf:
+                raise ZeroDivisionError("Cannot normalize a distribution whose probabilities are all 0")
+            self.array -= total
+        else:
+            total = self.array.sum()
+            if total == 0:
+                raise ZeroDivisionError("Cannot normalize a distribution whose probabilities are all 0")
+            self.array /= total
+        return self
+
+    def show_approx(self, numfmt: str = '{:.3g}') -> str:
+        """Show the probabilities rounded and sorted by key, for the
+        sake of portable doctests."""
+        return ', '.join([('{}: ' + numfmt).format(v, p) for (v, p) in sorted(self.prob.items())])
+
+    def __repr__(self) -> str:
+        return "P({})".format(self.var_name)
+
+
+class BatchProbDist:
+    """Many distributions of the same variable over the same domain, e.g.
+    the answers to one query for many evidence rows, stored as the rows of
+    one array of shape (number of distributions, len(domain)). Columns
+    follow domain; with log=True the array holds log-probabilities.
+    >>> B = BatchProbDist('X', (True, False), [[1, 3], [2, 2]]).normalize()
+    >>> B.p(True)
+    array([0.25, 0.5 ])
+    >>> B[0].show_approx()
+    'False: 0.75, True: 0.25'
+    """
+
+    def __init__(self, var_name: str = '?', domain: Tuple = (True, False), array: Optional[np.ndarray] = None,
+                 log: bool = False, copy: bool = True):
+        """array is copied unless copy is False."""
+        self.var_name = var_name
+        self.domain = tuple(domain)
+        self.index = {v: i for i, v in enumerate(self.domain)}
+        if array is None:
+            array = np.empty((0, len(self.domain)))
+        self.array = np.array(array, dtype=float) if copy else np.asarray(array, dtype=float)
+        assert self.array.ndim == 2 and self.array.shape[1] == len(self.domain), "array must have one column per value of domain"
+        self.log = log
+
+    def __len__(self) -> int:
+        return len(self.array)
+
+    def __getitem__(self, i: int) -> ArrayProbDist:
+        """Return distribution i, an ArrayProbDist sharing this batch's memory."""
+        return ArrayProbDist(self.var_name, self.domain, self.array[i], self.log, self.index, copy=False)
+
+    def p(self, val) -> np.ndarray:
+        """Return P(val) in every distribution."""
+        column = self.array[:, self.index[val]]
+        return np.exp(column) if self.log else column
+
+    @property
+    def probabilities(self) -> np.ndarray:
+        return np.exp(self.array) if self.log else self.array
+
+    @property
+    def log_probabilities(self) -> np.ndarray:
+        if self.log:
+            return self.array
+        with np.errstate(divide='ignore'):
+            return np.log(self.array)
+
+    def normalize(self) -> 'BatchProbDist':
+        """Make every row sum to 1, in log space if log is set. Returns the
+        normalized batch. Rows whose probabilities are all 0 become nan."""
+        with np.errstate(invalid='ignore', divide='ignore'):
+            if self.log:
+                self.array -= logsumexp(self.array, axis=1)[:, None]
+            else:
+                self.array /= self.array.sum(axis=1, keepdims=True)
+        return self
+
+    def argmax(self) -> np.ndarray:
+        """Return the position in domain of the most probable value of every distribution."""
+        return np.argmax(self.array, axis=1)
+
+    def __repr__(self) -> str:
+        return "P({}) x {}".format(self.var_name, len(self))
+
+
 def event_values(event: Union[Dict[str, int]], variables: List[str]) -> Tuple[int, ...]:
     """Return a tuple of the values of variables in event.
     >>> event_values ({'A': 10, 'B': 9, 'C': 8}, ['C', 'A'])